@@ -0,0 +1,212 @@
+"""
+Общие части бенчмарков: заглушка Telegram API, подсчёт запросов к БД,
+наполнение базы синтетическими пользователями и задачами.
+
+Модули бота читают DATABASE_URL при импорте, поэтому configure_env()
+нужно вызвать до первого импорта study_buddy_bot.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import random
+import tempfile
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+
+# Telegram id синтетических пользователей начинаются отсюда
+TELEGRAM_ID_BASE = 10_000_000
+SEED_BATCH_SIZE = 5000
+
+# Счётчик запросов текущей операции бенчмарка
+operation_queries: ContextVar[list[int] | None] = ContextVar("operation_queries", default=None)
+
+# Счётчик ошибок (записей лога уровня ERROR) текущей операции бенчмарка
+operation_errors: ContextVar[list[int] | None] = ContextVar("operation_errors", default=None)
+
+
+def configure_env(database_url: str | None, prefix: str) -> str:
+    """Выставляет переменные окружения бота; по умолчанию — временная SQLite."""
+    if not database_url:
+        path = os.path.join(tempfile.gettempdir(), f"{prefix}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        database_url = f"sqlite+aiosqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("BOT_TOKEN", "123456:bench")
+    os.environ.setdefault("ADMINS", "1")
+    os.environ["METRICS_PORT"] = "0"
+    # Бенчмарк шлёт шаги диалогов подряд — ограничение частоты исказило бы замеры
+    os.environ["THROTTLE_RATE"] = "0"
+    return database_url
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class QueryCounter:
+    """Считает все запросы движка и запросы внутри текущей операции."""
+
+    def __init__(self):
+        self.total = 0
+
+    def install(self, engine):
+        from sqlalchemy import event
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+        counter = operation_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+class ErrorCounter(logging.Handler):
+    """
+    Считает ошибки внутри текущей операции. Хендлеры бота ловят исключения
+    сами и пишут logging.exception, поэтому упавшая команда видна только в логе.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def install(self):
+        logging.getLogger().addHandler(self)
+
+    def emit(self, record: logging.LogRecord):
+        counter = operation_errors.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def make_stub_session(
+    latency: float = 0.0,
+    retry_after_rate: float = 0.0,
+    forbidden_rate: float = 0.0,
+    retry_after: int = 1,
+    seed_value: int = 42,
+):
+    """
+    Сессия Bot, которая не ходит в Telegram: записывает вызовы API и
+    отвечает правдоподобными объектами через `latency` секунд.
+
+    sendMessage с вероятностью `retry_after_rate` отвечает 429 (flood control),
+    а доля `forbidden_rate` чатов стабильно отвечает 403 (бот заблокирован).
+    """
+    from aiogram.client.session.base import BaseSession
+    from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+    from aiogram.methods import SendMessage
+    from aiogram.types import Chat, Message
+
+    rng = random.Random(seed_value)
+
+    class StubSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.calls: dict[str, int] = {}
+            self.errors: dict[str, int] = {"retry_after": 0, "forbidden": 0}
+            self._message_ids = itertools.count(1)
+
+        async def make_request(self, bot, method, timeout=None):
+            name = type(method).__name__
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if latency:
+                await asyncio.sleep(latency)
+            if isinstance(method, SendMessage):
+                if retry_after_rate and rng.random() < retry_after_rate:
+                    self.errors["retry_after"] += 1
+                    raise TelegramRetryAfter(method, "Too Many Requests", retry_after)
+                if forbidden_rate and random.Random(method.chat_id).random() < forbidden_rate:
+                    self.errors["forbidden"] += 1
+                    raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+                return Message(
+                    message_id=next(self._message_ids),
+                    date=datetime.now(),
+                    chat=Chat(id=method.chat_id, type="private"),
+                    text=method.text,
+                )
+            return True
+
+        async def stream_content(self, *args, **kwargs):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return StubSession()
+
+
+async def create_schema():
+    from sqlmodel import SQLModel
+    from study_buddy_bot import models  # noqa: F401 — регистрирует таблицы
+    from study_buddy_bot.db import engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+
+async def seed(
+    users: int,
+    tasks_per_user: int,
+    tomorrow_share: float = 0.2,
+    vary_tasks: bool = False,
+    seed_value: int = 42,
+):
+    """
+    Создаёт `users` пользователей по `tasks_per_user` задач (с vary_tasks —
+    от 0 до 2 × tasks_per_user, в среднем столько же). Дедлайны разбросаны
+    на ±2 недели, часть задач выполнена, примерно `tomorrow_share` задач
+    приходится на завтра. Дневные сводки пересобираются по созданным задачам.
+    """
+    from sqlalchemy import insert, select
+    from study_buddy_bot.db import AsyncSessionLocal
+    from study_buddy_bot.models import Task, User
+    from study_buddy_bot.stats_rollup import rebuild_daily_stats
+
+    rng = random.Random(seed_value)
+    today = date.today()
+    now = datetime.utcnow() + timedelta(hours=3)
+
+    for start in range(0, users, SEED_BATCH_SIZE):
+        count = min(SEED_BATCH_SIZE, users - start)
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert(User), [
+                {
+                    "telegram_id": TELEGRAM_ID_BASE + start + i,
+                    "first_name": f"user{start + i}",
+                    "registered_at": now - timedelta(days=30),
+                }
+                for i in range(count)
+            ])
+            result = await session.execute(
+                select(User.id).where(User.telegram_id >= TELEGRAM_ID_BASE + start).order_by(User.id).limit(count)
+            )
+            user_ids = list(result.scalars().all())
+
+            rows = []
+            for user_id in user_ids:
+                task_count = rng.randint(0, 2 * tasks_per_user) if vary_tasks else tasks_per_user
+                for _ in range(task_count):
+                    if rng.random() < tomorrow_share:
+                        deadline = today + timedelta(days=1)
+                    else:
+                        deadline = today + timedelta(days=rng.randint(-14, 14))
+                    created_at = now - timedelta(days=rng.randint(0, 28), minutes=rng.randint(0, 1439))
+                    is_done = deadline < today and rng.random() < 0.7
+                    rows.append({
+                        "user_id": user_id,
+                        "description": f"Задача {rng.randint(1, 10**6)}",
+                        "deadline": deadline,
+                        "created_at": created_at,
+                        "is_done": is_done,
+                        "done_at": min(created_at + timedelta(days=1), now) if is_done else None,
+                    })
+            if rows:
+                await session.execute(insert(Task), rows)
+                await rebuild_daily_stats(session, user_ids)
+            await session.commit()
@@ -0,0 +1,214 @@
+"""
+Нагрузочный прогон диспетчера без Telegram: настоящий Dispatcher из
+main.create_dispatcher, заглушка Bot API и синтетические апдейты.
+
+    python -m bench.dispatcher_bench --users 1000 --tasks 20 --ops 2000 --concurrency 50
+
+По умолчанию база — временная SQLite; --database-url позволяет
+прогнать тот же сценарий на локальном PostgreSQL (таблицы создаются,
+пользователи добавляются к существующим данным — используйте пустую базу).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from bench.common import (
+    TELEGRAM_ID_BASE,
+    ErrorCounter,
+    QueryCounter,
+    configure_env,
+    operation_errors,
+    operation_queries,
+    percentile,
+)
+
+COMMANDS = ("add", "list", "done", "stats", "edit")
+
+
+# Команда → последовательность сообщений пользователя (FSM-диалоги целиком)
+def command_script(command: str, rng: random.Random, tasks_per_user: int) -> list[str]:
+    number = rng.randint(1, max(tasks_per_user, 1))
+    deadline = (date.today() + timedelta(days=rng.randint(0, 30))).isoformat()
+    if command == "add":
+        return ["/add", f"Новая задача {rng.randint(1, 10**6)}", deadline]
+    if command == "list":
+        return ["/list"]
+    if command == "done":
+        return [f"/done {number}"]
+    if command == "stats":
+        return ["/stats"]
+    if command == "edit":
+        return [f"/edit {number}", "текст", f"Изменённая задача {rng.randint(1, 10**6)}"]
+    raise ValueError(command)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк обработки апдейтов диспетчером")
+    parser.add_argument("--users", type=int, default=1000, help="сколько пользователей создать")
+    parser.add_argument("--tasks", type=int, default=20, help="задач на пользователя")
+    parser.add_argument("--ops", type=int, default=2000, help="сколько команд выполнить")
+    parser.add_argument("--concurrency", type=int, default=50, help="команд одновременно")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="список команд через запятую")
+    parser.add_argument("--fsm", choices=("sql", "memory"), default="sql", help="хранилище FSM")
+    parser.add_argument("--database-url", help="БД для прогона (по умолчанию временная SQLite)")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчёт в JSON (для сравнения между релизами)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def build_update(update_id: int, message_id: int, telegram_id: int, text: str):
+    from aiogram.types import Chat, Message, Update, User as TgUser
+
+    user = TgUser(id=telegram_id, is_bot=False, first_name=f"user{telegram_id}")
+    message = Message(
+        message_id=message_id,
+        date=datetime.now(),
+        chat=Chat(id=telegram_id, type="private"),
+        from_user=user,
+        text=text,
+    )
+    return Update(update_id=update_id, message=message)
+
+
+async def run(args):
+    from aiogram import Bot
+    from aiogram.client.default import DefaultBotProperties
+    from study_buddy_bot.db import engine
+    from study_buddy_bot.fsm_storage import SQLStorage
+    from study_buddy_bot.main import create_dispatcher
+    from bench.common import create_schema, make_stub_session, seed
+
+    # Логи каждого апдейта сильно искажают замеры
+    logging.getLogger().setLevel(logging.WARNING)
+
+    await create_schema()
+    started = time.perf_counter()
+    await seed(args.users, args.tasks, seed_value=args.seed)
+    print(f"База заполнена за {time.perf_counter() - started:.1f} с: "
+          f"{args.users} пользователей × {args.tasks} задач")
+
+    session = make_stub_session()
+    bot = Bot(token="123456:bench", session=session, default=DefaultBotProperties(parse_mode="HTML"))
+    dp = create_dispatcher(SQLStorage() if args.fsm == "sql" else None)
+
+    counter = QueryCounter()
+    counter.install(engine)
+    ErrorCounter().install()
+
+    rng = random.Random(args.seed)
+    commands = [c.strip() for c in args.commands.split(",") if c.strip()]
+    plan = [commands[i % len(commands)] for i in range(args.ops)]
+    rng.shuffle(plan)
+
+    # Один пользователь не выполняет две команды одновременно, иначе его
+    # FSM-диалоги перемешаются. Свободные пользователи лежат в очереди.
+    free_users: asyncio.Queue[int] = asyncio.Queue()
+    for telegram_id in rng.sample(range(TELEGRAM_ID_BASE, TELEGRAM_ID_BASE + args.users), args.users):
+        free_users.put_nowait(telegram_id)
+
+    update_ids = itertools.count(1)
+    message_ids = itertools.count(1)
+    latencies: dict[str, list[float]] = {c: [] for c in commands}
+    queries: dict[str, list[int]] = {c: [] for c in commands}
+    # Команды, при выполнении которых что-то упало: в задержки они не входят
+    failures: dict[str, int] = {c: 0 for c in commands}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def execute(command: str):
+        async with semaphore:
+            telegram_id = await free_users.get()
+            try:
+                script = command_script(command, rng, args.tasks)
+                counted = [0]
+                errors = [0]
+                token = operation_queries.set(counted)
+                errors_token = operation_errors.set(errors)
+                op_started = time.perf_counter()
+                try:
+                    for text in script:
+                        update = build_update(next(update_ids), next(message_ids), telegram_id, text)
+                        await dp.feed_update(bot, update)
+                except Exception:
+                    errors[0] += 1
+                elapsed_op = time.perf_counter() - op_started
+                operation_queries.reset(token)
+                operation_errors.reset(errors_token)
+                if errors[0]:
+                    failures[command] += 1
+                else:
+                    latencies[command].append(elapsed_op)
+                    queries[command].append(counted[0])
+            finally:
+                free_users.put_nowait(telegram_id)
+
+    queries_before = counter.total
+    started = time.perf_counter()
+    await asyncio.gather(*(execute(command) for command in plan))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "users": args.users,
+        "tasks_per_user": args.tasks,
+        "ops": args.ops,
+        "concurrency": args.concurrency,
+        "fsm": args.fsm,
+        "dialect": engine.dialect.name,
+        "elapsed_s": elapsed,
+        "ops_per_s": args.ops / elapsed if elapsed else 0.0,
+        "queries_total": counter.total - queries_before,
+        "api_calls": session.calls,
+        "commands": {
+            command: {
+                "count": len(latencies[command]) + failures[command],
+                "errors": failures[command],
+                "error_rate": failures[command] / (len(latencies[command]) + failures[command] or 1),
+                # Задержки и запросы — только по успешным командам
+                "ok": len(latencies[command]),
+                "p50_ms": percentile(latencies[command], 50) * 1000,
+                "p99_ms": percentile(latencies[command], 99) * 1000,
+                "max_ms": max(latencies[command], default=0.0) * 1000,
+                "queries_avg": sum(queries[command]) / len(queries[command]) if queries[command] else 0.0,
+                "queries_max": max(queries[command], default=0),
+            }
+            for command in commands
+        },
+    }
+    await bot.session.close()
+    return report
+
+
+def print_report(report: dict):
+    print(
+        f"\n{report['ops']} команд за {report['elapsed_s']:.2f} с — "
+        f"{report['ops_per_s']:.1f} команд/с (параллельно {report['concurrency']}, "
+        f"{report['dialect']}, FSM {report['fsm']})"
+    )
+    print(f"Запросов к БД: {report['queries_total']}, вызовов API: {report['api_calls']}\n")
+    print(
+        f"{'команда':<8} {'кол-во':>7} {'ошибок':>7} {'доля':>6} {'p50, мс':>9} {'p99, мс':>9} "
+        f"{'max, мс':>9} {'запр/ком':>9} {'max запр':>9}"
+    )
+    for command, row in report["commands"].items():
+        print(
+            f"/{command:<7} {row['count']:>7} {row['errors']:>7} {row['error_rate']:>6.1%} "
+            f"{row['p50_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+            f"{row['max_ms']:>9.1f} {row['queries_avg']:>9.1f} {row['queries_max']:>9}"
+        )
+    failed = sum(row["errors"] for row in report["commands"].values())
+    if failed:
+        print(f"\n⚠️  Команд с ошибками: {failed}. Задержки и запросы посчитаны только по успешным.")
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure_env(arguments.database_url, "studybuddy_dispatcher_bench")
+    result = asyncio.run(run(arguments))
+    print_report(result)
+    if arguments.json_path:
+        with open(arguments.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
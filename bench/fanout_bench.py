@@ -0,0 +1,166 @@
+"""
+Бенчмарк массовых отправок: напоминания notify_tomorrows_tasks и рассылка
+всем пользователям (create_broadcast_job + process_job) на масштабе ~100 тыс.
+пользователей, с заглушкой Bot API, задержкой ответа и долей ошибок 429/403.
+
+    python -m bench.fanout_bench --users 100000 --latency 0.03 --rate 1000
+
+Лимит отправки (--rate) по умолчанию выше настоящего лимита Telegram
+(30 сообщ./сек), чтобы прогон занимал минуты, а не час; с --rate 30
+получится реальное время доставки.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import time
+import tracemalloc
+
+from bench.common import QueryCounter, configure_env
+
+SCENARIOS = ("reminders", "broadcast")
+ADMIN_CHAT_ID = 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк напоминаний и рассылок")
+    parser.add_argument("--users", type=int, default=100_000, help="сколько пользователей создать")
+    parser.add_argument("--tasks", type=int, default=3, help="в среднем задач на пользователя")
+    parser.add_argument("--tomorrow-share", type=float, default=0.25, help="доля задач с дедлайном завтра")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="reminders,broadcast")
+    parser.add_argument("--latency", type=float, default=0.03, help="задержка ответа Bot API, сек")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0001, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429, сек")
+    parser.add_argument("--forbidden-rate", type=float, default=0.03, help="доля чатов, заблокировавших бота")
+    parser.add_argument("--rate", type=float, default=1000, help="SEND_RATE_LIMIT, сообщ./сек")
+    parser.add_argument("--workers", type=int, default=50, help="SEND_WORKERS")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="не замерять пик памяти (быстрее)")
+    parser.add_argument("--database-url", help="БД для прогона (по умолчанию временная SQLite)")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчёт в JSON")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+async def measure(name: str, coro_factory, session, counter: QueryCounter, use_tracemalloc: bool) -> dict:
+    calls_before = session.calls.get("SendMessage", 0)
+    errors_before = dict(session.errors)
+    queries_before = counter.total
+    if use_tracemalloc:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    started = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - started
+
+    attempts = session.calls.get("SendMessage", 0) - calls_before
+    retry_after = session.errors["retry_after"] - errors_before["retry_after"]
+    forbidden = session.errors["forbidden"] - errors_before["forbidden"]
+    delivered = attempts - retry_after - forbidden
+    result = {
+        "scenario": name,
+        "elapsed_s": elapsed,
+        "attempts": attempts,
+        "delivered": delivered,
+        "retry_after": retry_after,
+        "forbidden": forbidden,
+        "msgs_per_s": delivered / elapsed if elapsed else 0.0,
+        "queries": counter.total - queries_before,
+    }
+    if use_tracemalloc:
+        result["peak_traced_mb"] = (tracemalloc.get_traced_memory()[1] - memory_before) / 2**20
+    # ru_maxrss — пик за весь процесс (КБ в Linux), включая заполнение базы
+    result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+async def run(args):
+    from aiogram import Bot
+    from aiogram.client.default import DefaultBotProperties
+    from study_buddy_bot.broadcasts import create_broadcast_job, process_job
+    from study_buddy_bot.db import engine
+    from study_buddy_bot.job_store import leader
+    from study_buddy_bot.scheduler import notify_tomorrows_tasks
+    from bench.common import create_schema, make_stub_session, seed
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    await create_schema()
+    started = time.perf_counter()
+    await seed(args.users, args.tasks, tomorrow_share=args.tomorrow_share, vary_tasks=True, seed_value=args.seed)
+    print(f"База заполнена за {time.perf_counter() - started:.1f} с: {args.users} пользователей")
+
+    session = make_stub_session(
+        latency=args.latency,
+        retry_after_rate=args.retry_after_rate,
+        forbidden_rate=args.forbidden_rate,
+        retry_after=args.retry_after,
+        seed_value=args.seed,
+    )
+    bot = Bot(token="123456:bench", session=session, default=DefaultBotProperties(parse_mode="HTML"))
+    counter = QueryCounter()
+    counter.install(engine)
+
+    async def broadcast():
+        job, _ = await create_broadcast_job(ADMIN_CHAT_ID, "Бенчмарк рассылки")
+        await leader.renew()
+        await process_job(bot, job.id)
+
+    factories = {
+        "reminders": lambda: notify_tomorrows_tasks(bot),
+        "broadcast": broadcast,
+    }
+    use_tracemalloc = not args.no_tracemalloc
+    if use_tracemalloc:
+        tracemalloc.start()
+
+    results = []
+    for name in (s.strip() for s in args.scenarios.split(",") if s.strip()):
+        print(f"Сценарий {name}…")
+        results.append(await measure(name, factories[name], session, counter, use_tracemalloc))
+
+    if use_tracemalloc:
+        tracemalloc.stop()
+    await bot.session.close()
+    return {
+        "users": args.users,
+        "dialect": engine.dialect.name,
+        "latency_s": args.latency,
+        "retry_after_rate": args.retry_after_rate,
+        "forbidden_rate": args.forbidden_rate,
+        "rate_limit": args.rate,
+        "workers": args.workers,
+        "scenarios": results,
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"\n{report['users']} пользователей, {report['dialect']}, задержка API {report['latency_s'] * 1000:.0f} мс, "
+        f"429: {report['retry_after_rate']:.2%}, 403: {report['forbidden_rate']:.2%}, "
+        f"лимит {report['rate_limit']:.0f} сообщ./сек, воркеров {report['workers']}\n"
+    )
+    for row in report["scenarios"]:
+        memory = f"{row['peak_traced_mb']:.1f} МБ" if "peak_traced_mb" in row else "—"
+        print(
+            f"{row['scenario']}: {row['elapsed_s']:.1f} с, доставлено {row['delivered']} "
+            f"({row['msgs_per_s']:.0f} сообщ./сек), 429: {row['retry_after']}, 403: {row['forbidden']}, "
+            f"запросов к БД: {row['queries']}, пик памяти: {memory}, max RSS: {row['max_rss_mb']:.0f} МБ"
+        )
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure_env(arguments.database_url, "studybuddy_fanout_bench")
+    # Параметры отправителя читаются при импорте config
+    os.environ["SEND_RATE_LIMIT"] = str(arguments.rate)
+    os.environ["SEND_WORKERS"] = str(arguments.workers)
+    # Инстанс один: аренды лидера хватает на весь прогон без продления
+    os.environ["SCHEDULER_LEASE_TTL"] = "86400"
+    result = asyncio.run(run(arguments))
+    print_report(result)
+    if arguments.json_path:
+        with open(arguments.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,29 @@
+import asyncio
+import sys
+from sqlalchemy import select
+from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.models import User
+from study_buddy_bot.stats_rollup import rebuild_daily_stats
+
+# Сколько пользователей пересчитываем за одну транзакцию
+BATCH_SIZE = 500
+
+async def backfill_stats(batch_size: int = BATCH_SIZE):
+    last_id = 0
+    processed = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            stmt = select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            result = await session.execute(stmt)
+            user_ids = list(result.scalars().all())
+            if not user_ids:
+                break
+            await rebuild_daily_stats(session, user_ids)
+            await session.commit()
+        last_id = user_ids[-1]
+        processed += len(user_ids)
+        print(f"… пересчитано пользователей: {processed}")
+    print("✅ Дневная статистика пересобрана!")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_stats(int(sys.argv[1]) if len(sys.argv) > 1 else BATCH_SIZE))
@@ -0,0 +1,81 @@
+import asyncio
+import importlib
+import pkgutil
+import sys
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from study_buddy_bot.db import engine
+import db.migrations
+
+# Таблица с применёнными миграциями
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def load_migrations() -> list[tuple[str, object]]:
+    """
+    Находит модули NNNN_*.py в db/migrations и возвращает их по порядку номеров.
+    """
+    migrations = []
+    for module in pkgutil.iter_modules(db.migrations.__path__):
+        version = module.name.split("_", 1)[0]
+        if not version.isdigit():
+            continue
+        migrations.append((module.name, importlib.import_module(f"db.migrations.{module.name}")))
+    return sorted(migrations)
+
+
+async def applied_versions() -> set[str]:
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        result = await conn.execute(select(schema_migrations.c.version))
+        return set(result.scalars().all())
+
+
+async def apply_migration(name: str, module):
+    record = schema_migrations.insert().values(version=name, applied_at=datetime.utcnow())
+    if getattr(module, "TRANSACTIONAL", True):
+        # Миграция и отметка о ней — в одной транзакции
+        async with engine.begin() as conn:
+            await module.upgrade(conn)
+            await conn.execute(record)
+    else:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await module.upgrade(conn)
+            await conn.execute(record)
+
+
+async def migrate():
+    applied = await applied_versions()
+    pending = [(name, module) for name, module in load_migrations() if name not in applied]
+    if not pending:
+        print("✅ Схема актуальна, новых миграций нет.")
+        return
+    for name, module in pending:
+        print(f"→ {name}: {(module.__doc__ or '').strip()}")
+        await apply_migration(name, module)
+    print(f"✅ Применено миграций: {len(pending)}")
+
+
+async def status():
+    applied = await applied_versions()
+    for name, module in load_migrations():
+        mark = "✅" if name in applied else "⏳"
+        print(f"{mark} {name}: {(module.__doc__ or '').strip()}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        asyncio.run(status())
+    elif command == "upgrade":
+        asyncio.run(migrate())
+    else:
+        print("Использование: python -m db.migrate [upgrade|status]")
+        sys.exit(1)
@@ -0,0 +1,85 @@
+"""Базовая схема: таблицы, которые были до появления миграций."""
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table,
+)
+
+# Схема заморожена: таблицы описаны здесь, а не взяты из study_buddy_bot.models.
+# Иначе на пустой БД create_all сразу создал бы колонки и индексы из следующих
+# миграций, и результат зависел бы от версии кода, которой запускают migrate.
+# Всё, что добавляется позже, — только в новых миграциях.
+metadata = MetaData()
+
+Table(
+    "user",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("telegram_id", Integer, nullable=False),
+    Column("first_name", String),
+    Column("username", String),
+    Column("is_admin", Boolean, nullable=False),
+    Column("registered_at", DateTime, nullable=False),
+    Index("ix_user_telegram_id", "telegram_id", unique=True),
+)
+
+Table(
+    "task",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("description", String, nullable=False),
+    Column("deadline", Date, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("is_done", Boolean, nullable=False),
+    Column("done_at", DateTime),
+)
+
+Table(
+    "broadcastjob",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("admin_chat_id", Integer, nullable=False),
+    Column("text", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("total", Integer, nullable=False),
+    Column("sent", Integer, nullable=False),
+    Column("failed", Integer, nullable=False),
+    Column("blocked", Integer, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("started_at", DateTime),
+    Column("finished_at", DateTime),
+    Index("ix_broadcastjob_status", "status"),
+)
+
+Table(
+    "broadcastrecipient",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("job_id", Integer, ForeignKey("broadcastjob.id"), nullable=False),
+    Column("telegram_id", Integer, nullable=False),
+    Column("status", String, nullable=False),
+    Index("ix_broadcastrecipient_job_status", "job_id", "status", "id"),
+)
+
+Table(
+    "userdailystats",
+    metadata,
+    Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("added", Integer, nullable=False),
+    Column("done", Integer, nullable=False),
+    Column("closed", Integer, nullable=False),
+)
+
+Table(
+    "fsmrecord",
+    metadata,
+    Column("key", String, primary_key=True),
+    Column("state", String),
+    Column("data", String, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_fsmrecord_updated_at", "updated_at"),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(metadata.create_all)
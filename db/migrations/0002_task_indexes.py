@@ -0,0 +1,33 @@
+"""Индексы для горячих запросов к task: /list, /done, напоминания, статистика."""
+from sqlalchemy import Column, Index, MetaData, Table
+from db.migrations.helpers import create_index
+
+TRANSACTIONAL = False
+
+# Замороженное описание: только колонки, нужные индексам этой миграции
+metadata = MetaData()
+task = Table(
+    "task",
+    metadata,
+    Column("id"),
+    Column("user_id"),
+    Column("deadline"),
+    Column("is_done"),
+    Column("created_at"),
+    Column("done_at"),
+)
+
+INDEXES = (
+    # Покрывает список задач пользователя и поиск задачи по номеру в /list
+    Index("ix_task_user_done_deadline", task.c.user_id, task.c.is_done, task.c.deadline, task.c.id),
+    # Напоминания: задачи с дедлайном в ближайшие дни
+    Index("ix_task_deadline_done", task.c.deadline, task.c.is_done),
+    # Диапазоны created_at / done_at для статистики
+    Index("ix_task_user_created_at", task.c.user_id, task.c.created_at),
+    Index("ix_task_user_done_at", task.c.user_id, task.c.done_at),
+)
+
+
+async def upgrade(conn):
+    for index in INDEXES:
+        await create_index(conn, index)
@@ -0,0 +1,13 @@
+"""Часовой пояс и время напоминаний пользователя."""
+from sqlalchemy import Column, Index, MetaData, Table
+from db.migrations.helpers import add_column, create_index
+
+metadata = MetaData()
+user = Table("user", metadata, Column("reminder_slot"))
+
+
+async def upgrade(conn):
+    await add_column(conn, "user", "timezone", "VARCHAR NOT NULL DEFAULT 'Europe/Moscow'")
+    await add_column(conn, "user", "reminder_minute", "INTEGER NOT NULL DEFAULT 1140")
+    await add_column(conn, "user", "reminder_slot", "INTEGER DEFAULT 960")
+    await create_index(conn, Index("ix_user_reminder_slot", user.c.reminder_slot))
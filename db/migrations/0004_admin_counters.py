@@ -0,0 +1,67 @@
+"""Счётчики для /adminstats и день последней активности пользователя."""
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Index, Integer, MetaData, String, Table,
+    delete, func, insert, literal, select, union_all,
+)
+from db.migrations.helpers import add_column, create_index
+
+# Замороженная схема на момент миграции
+metadata = MetaData()
+bot_counter = Table(
+    "botcounter",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+daily_counter = Table(
+    "dailycounter",
+    metadata,
+    Column("day", Date, primary_key=True),
+    Column("name", String, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+# Уже существующие таблицы: только колонки, которые здесь нужны
+user = Table("user", metadata, Column("id", Integer), Column("last_active_day", Date))
+task = Table(
+    "task",
+    metadata,
+    Column("is_done", Boolean),
+    Column("created_at", DateTime),
+    Column("done_at", DateTime),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(bot_counter.create, checkfirst=True)
+    await conn.run_sync(daily_counter.create, checkfirst=True)
+    await add_column(conn, "user", "last_active_day", "DATE")
+    await create_index(conn, Index("ix_user_last_active_day", user.c.last_active_day))
+
+    # Один раз считаем итоги по существующим данным; дальше счётчики
+    # обновляются вместе с событиями
+    users = (await conn.execute(select(func.count()).select_from(user))).scalar_one()
+    tasks_created = (await conn.execute(select(func.count()).select_from(task))).scalar_one()
+    tasks_done = (await conn.execute(
+        select(func.count()).select_from(task).where(task.c.is_done == True)
+    )).scalar_one()
+    await conn.execute(delete(bot_counter))
+    await conn.execute(insert(bot_counter), [
+        {"name": "users", "value": users},
+        {"name": "tasks_created", "value": tasks_created},
+        {"name": "tasks_done", "value": tasks_done},
+    ])
+
+    # Дневные значения считаем прямо по task, а не по userdailystats:
+    # сводки пользователей заполняет db.backfill_stats, и на базе, где его
+    # ещё не запускали, счётчики /adminstats остались бы пустыми
+    await conn.execute(delete(daily_counter))
+    created_day = func.date(task.c.created_at)
+    done_day = func.date(task.c.done_at)
+    daily = union_all(
+        select(created_day, literal("tasks_created"), func.count())
+        .group_by(created_day),
+        select(done_day, literal("tasks_done"), func.count())
+        .where(task.c.is_done == True, task.c.done_at.is_not(None))
+        .group_by(done_day),
+    )
+    await conn.execute(insert(daily_counter).from_select(["day", "name", "value"], daily))
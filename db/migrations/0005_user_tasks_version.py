@@ -0,0 +1,6 @@
+"""Версия списка задач пользователя для кэша /list."""
+from db.migrations.helpers import add_column
+
+
+async def upgrade(conn):
+    await add_column(conn, "user", "tasks_version", "INTEGER NOT NULL DEFAULT 0")
@@ -0,0 +1,30 @@
+"""Архив выполненных задач и индекс для архиватора."""
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+from db.migrations.helpers import create_index
+
+TRANSACTIONAL = False
+
+# Замороженная схема на момент миграции
+metadata = MetaData()
+# Уже существующие таблицы: только колонки для внешнего ключа и индекса
+Table("user", metadata, Column("id", Integer, primary_key=True))
+task = Table("task", metadata, Column("is_done"), Column("done_at"))
+
+task_archive = Table(
+    "taskarchive",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("description", String, nullable=False),
+    Column("deadline", Date, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("done_at", DateTime),
+    Column("archived_at", DateTime, nullable=False),
+    Index("ix_taskarchive_user_done_at", "user_id", "done_at"),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(task_archive.create, checkfirst=True)
+    # Архиватор: выполненные задачи старше порога
+    await create_index(conn, Index("ix_task_done_done_at", task.c.is_done, task.c.done_at))
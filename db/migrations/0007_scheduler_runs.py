@@ -0,0 +1,49 @@
+"""Аренда лидера и однократные запуски задач планировщика."""
+from datetime import datetime, timedelta
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert
+from study_buddy_bot.config import REMINDER_BUCKET_MINUTES, SCHEDULER_CATCHUP_MINUTES, SCHEDULER_PARTITIONS
+
+# Замороженная схема на момент миграции
+metadata = MetaData()
+scheduler_lease = Table(
+    "schedulerlease",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("holder", String, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+)
+job_run = Table(
+    "jobrun",
+    metadata,
+    Column("job", String, primary_key=True),
+    Column("bucket", DateTime, primary_key=True),
+    Column("partition", Integer, primary_key=True),
+    Column("claimed_by", String, nullable=False),
+    Column("claimed_at", DateTime, nullable=False),
+    Column("finished_at", DateTime),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(scheduler_lease.create, checkfirst=True)
+    await conn.run_sync(job_run.create, checkfirst=True)
+
+    # Интервалы в окне догона (и текущий) уже разосланы старой версией —
+    # отмечаем их выполненными, иначе первый запуск после обновления
+    # отправит их повторно
+    now = datetime.utcnow()
+    step = timedelta(minutes=REMINDER_BUCKET_MINUTES)
+    current = datetime.min + (now - datetime.min) // step * step
+    buckets = [current - i * step for i in range(SCHEDULER_CATCHUP_MINUTES // REMINDER_BUCKET_MINUTES + 1)]
+    await conn.execute(insert(job_run), [
+        {
+            "job": "reminders",
+            "bucket": bucket,
+            "partition": partition,
+            "claimed_by": "migration",
+            "claimed_at": now,
+            "finished_at": now,
+        }
+        for bucket in buckets
+        for partition in range(SCHEDULER_PARTITIONS)
+    ])
@@ -0,0 +1,6 @@
+"""Контрольная точка запуска задачи планировщика."""
+from db.migrations.helpers import add_column
+
+
+async def upgrade(conn):
+    await add_column(conn, "jobrun", "progress", "INTEGER")
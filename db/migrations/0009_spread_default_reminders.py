@@ -0,0 +1,25 @@
+"""Разносит напоминания по умолчанию на час 19:00–19:59 вместо одной минуты."""
+from sqlalchemy import column, table, update
+
+# Замороженное описание нужных колонок: миграция не зависит от текущих моделей
+user = table("user", column("telegram_id"), column("reminder_minute"), column("reminder_slot"))
+
+# Значения из study_buddy_bot.scheduler на момент миграции
+DEFAULT_REMINDER_MINUTE = 19 * 60
+DEFAULT_REMINDER_SPREAD = 60
+MINUTES_PER_DAY = 24 * 60
+
+
+async def upgrade(conn):
+    # Время 19:00 не отличить от выбранного вручную, поэтому сдвигаем всех с
+    # ровно 19:00 — не больше чем на 59 минут. Слот уже учитывает пояс
+    # пользователя, и к нему прибавляется тот же сдвиг
+    shift = user.c.telegram_id % DEFAULT_REMINDER_SPREAD
+    await conn.execute(
+        update(user)
+        .where(user.c.reminder_minute == DEFAULT_REMINDER_MINUTE, user.c.reminder_slot.is_not(None))
+        .values(
+            reminder_minute=user.c.reminder_minute + shift,
+            reminder_slot=(user.c.reminder_slot + shift) % MINUTES_PER_DAY,
+        )
+    )
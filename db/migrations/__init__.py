@@ -0,0 +1,6 @@
+"""
+Версионированные миграции схемы. Файл NNNN_<описание>.py содержит
+`async def upgrade(conn)`; миграции применяются по порядку номеров и только вперёд.
+Если в модуле TRANSACTIONAL = False, миграция выполняется в режиме
+autocommit (например, для CREATE INDEX CONCURRENTLY в PostgreSQL).
+"""
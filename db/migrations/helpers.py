@@ -0,0 +1,55 @@
+from sqlalchemy import Index, inspect, text
+
+
+def _column_names(sync_conn, table: str) -> set[str]:
+    return {column["name"] for column in inspect(sync_conn).get_columns(table)}
+
+
+async def add_column(conn, table: str, column: str, ddl: str):
+    """
+    ALTER TABLE ... ADD COLUMN, если такой колонки ещё нет.
+    `ddl` — тип и ограничения, одинаковые для PostgreSQL и SQLite.
+    """
+    existing = await conn.run_sync(_column_names, table)
+    if column in existing:
+        return
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    await conn.execute(text(f"ALTER TABLE {quoted} ADD COLUMN {column} {ddl}"))
+
+
+async def create_index(conn, index: Index):
+    """
+    CREATE INDEX, если такого индекса ещё нет. В PostgreSQL в миграции с
+    TRANSACTIONAL = False индекс строится CONCURRENTLY, не блокируя запись
+    в таблицу; внутри транзакции CONCURRENTLY недопустим, строим обычным.
+    Недостроенный (INVALID) индекс от прерванного запуска пересоздаётся.
+    """
+    await conn.run_sync(_create_index, index)
+
+
+def _create_index(sync_conn, index: Index):
+    autocommit = sync_conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+    if sync_conn.dialect.name != "postgresql" or not autocommit:
+        index.create(sync_conn, checkfirst=True)
+        return
+    # Прерванный CREATE INDEX CONCURRENTLY оставляет индекс в статусе
+    # INVALID: он есть в каталоге, но не используется запросами, и
+    # checkfirst его бы пропустил. Такой индекс удаляем и строим заново.
+    invalid = sync_conn.execute(
+        text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_catalog.pg_table_is_visible(c.oid)"
+        ),
+        {"name": index.name},
+    ).scalar()
+    if invalid:
+        quoted = sync_conn.dialect.identifier_preparer.quote(index.name)
+        sync_conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {quoted}"))
+    options = index.dialect_options["postgresql"]
+    previous = options["concurrently"]
+    options["concurrently"] = True
+    try:
+        index.create(sync_conn, checkfirst=True)
+    finally:
+        options["concurrently"] = previous
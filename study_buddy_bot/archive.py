@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select, update
+from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.models import Task, TaskArchive, User
+from study_buddy_bot.config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_MAX_BATCHES
+
+# Колонки, которые переносятся из Task в TaskArchive
+ARCHIVE_COLUMNS = ("id", "user_id", "description", "deadline", "created_at", "done_at")
+
+
+async def archive_batch(session, cutoff: datetime, batch_size: int, archived_at: datetime) -> int:
+    """
+    Переносит в архив до batch_size задач, выполненных раньше cutoff,
+    и увеличивает версию списка задач их владельцев. Возвращает число
+    перенесённых задач; коммит — за вызывающим.
+    """
+    # SKIP LOCKED: если архиватор запущен на нескольких инстансах,
+    # они забирают разные пачки, а не ждут друг друга (в SQLite игнорируется)
+    result = await session.execute(
+        select(Task.id, Task.user_id)
+        .where(Task.is_done == True, Task.done_at < cutoff)
+        .order_by(Task.done_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+    task_ids = [task_id for task_id, _ in rows]
+    user_ids = {user_id for _, user_id in rows}
+
+    await session.execute(
+        insert(TaskArchive).from_select(
+            [*ARCHIVE_COLUMNS, "archived_at"],
+            select(*(getattr(Task, name) for name in ARCHIVE_COLUMNS), literal(archived_at))
+            .where(Task.id.in_(task_ids)),
+        )
+    )
+    await session.execute(delete(Task).where(Task.id.in_(task_ids)))
+    # Из «выполненных» в /list задачи пропали — кэш страниц больше не актуален
+    await session.execute(
+        update(User).where(User.id.in_(user_ids)).values(tasks_version=User.tasks_version + 1)
+    )
+    return len(task_ids)
+
+
+async def archive_done_tasks(
+    after_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: int = ARCHIVE_MAX_BATCHES,
+) -> int:
+    """
+    Переносит выполненные больше after_days дней назад задачи в TaskArchive
+    пачками по batch_size, каждую пачку — своей короткой транзакцией.
+    За запуск — не больше max_batches пачек, остаток дождётся следующего.
+    """
+    if after_days <= 0:
+        return 0
+    now = datetime.utcnow() + timedelta(hours=3)
+    cutoff = now - timedelta(days=after_days)
+    total = 0
+    for _ in range(max_batches):
+        async with AsyncSessionLocal() as session:
+            moved = await archive_batch(session, cutoff, batch_size, now)
+            await session.commit()
+        total += moved
+        if moved < batch_size:
+            break
+        # Между пачками отдаём управление обработчикам апдейтов
+        await asyncio.sleep(0)
+    if total:
+        logging.info("[Archive] В архив перенесено задач: %s", total)
+    return total
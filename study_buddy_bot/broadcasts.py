@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from datetime import datetime
+from aiogram import Bot
+from sqlalchemy import select, insert, update, literal
+from study_buddy_bot.models import User, BroadcastJob, BroadcastRecipient
+from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.sender import OutboundSender
+from study_buddy_bot.job_store import leader
+from study_buddy_bot.config import BROADCAST_CHUNK_SIZE, BROADCAST_POLL_INTERVAL
+
+# Сколько недоставленных id показываем администратору в отчёте
+REPORT_IDS_LIMIT = 50
+
+# Будит воркер, когда появляется новая рассылка
+_wakeup = asyncio.Event()
+
+
+async def create_broadcast_job(admin_chat_id: int, text: str, ids: list[int] | None = None):
+    """
+    Создаёт рассылку и одним INSERT ... SELECT записывает всех получателей.
+    Возвращает (job, список id, которых нет в базе).
+    """
+    async with AsyncSessionLocal() as session:
+        invalid_ids = []
+        if ids:
+            result = await session.execute(select(User.telegram_id).where(User.telegram_id.in_(ids)))
+            found = set(result.scalars().all())
+            invalid_ids = [uid for uid in ids if uid not in found]
+
+        job = BroadcastJob(admin_chat_id=admin_chat_id, text=text)
+        session.add(job)
+        await session.flush()
+
+        source = select(literal(job.id), User.telegram_id).order_by(User.id)
+        if ids:
+            source = source.where(User.telegram_id.in_(ids))
+        result = await session.execute(
+            insert(BroadcastRecipient).from_select(["job_id", "telegram_id"], source)
+        )
+        job.total = result.rowcount
+        await session.commit()
+
+    _wakeup.set()
+    return job, invalid_ids
+
+
+async def get_broadcast_job(job_id: int | None = None) -> BroadcastJob | None:
+    """
+    Возвращает рассылку по id или последнюю созданную.
+    """
+    async with AsyncSessionLocal() as session:
+        if job_id is not None:
+            return await session.get(BroadcastJob, job_id)
+        stmt = select(BroadcastJob).order_by(BroadcastJob.id.desc()).limit(1)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+
+def format_job_status(job: BroadcastJob) -> str:
+    processed = job.sent + job.failed + job.blocked
+    text = (
+        f"<b>Рассылка #{job.id}</b> ({job.status})\n"
+        f"• Отправлено: <b>{job.sent}</b>\n"
+        f"• Не доставлено: <b>{job.failed}</b>\n"
+        f"• Заблокировали бота: <b>{job.blocked}</b>\n"
+        f"• Осталось: <b>{job.total - processed}</b> из {job.total}"
+    )
+    if job.started_at:
+        finished = job.finished_at or datetime.utcnow()
+        elapsed = (finished - job.started_at).total_seconds()
+        if elapsed > 0:
+            text += f"\n• Скорость: <b>{processed / elapsed:.1f}</b> сообщ./сек"
+    return text
+
+
+async def _next_job_id() -> int | None:
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            select(BroadcastJob.id)
+            .where(BroadcastJob.status != "done")
+            .order_by(BroadcastJob.id)
+            .limit(1)
+        )
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+
+async def _process_chunk(sender: OutboundSender, job: BroadcastJob) -> bool:
+    """
+    Отправляет очередную порцию получателей и фиксирует результат
+    одной транзакцией. Возвращает False, когда получателей не осталось.
+    """
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            select(BroadcastRecipient.id, BroadcastRecipient.telegram_id)
+            .where(
+                BroadcastRecipient.job_id == job.id,
+                BroadcastRecipient.status == "pending",
+            )
+            .order_by(BroadcastRecipient.id)
+            .limit(BROADCAST_CHUNK_SIZE)
+        )
+        result = await session.execute(stmt)
+        chunk = result.all()
+    if not chunk:
+        return False
+
+    report = await sender.deliver((telegram_id, job.text) for _, telegram_id in chunk)
+
+    chunk_ids = [row_id for row_id, _ in chunk]
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(BroadcastRecipient)
+            .where(BroadcastRecipient.id.in_(chunk_ids))
+            .values(status="delivered")
+        )
+        for status, telegram_ids in (("failed", report.failed_ids), ("blocked", report.blocked_ids)):
+            if telegram_ids:
+                await session.execute(
+                    update(BroadcastRecipient)
+                    .where(
+                        BroadcastRecipient.id.in_(chunk_ids),
+                        BroadcastRecipient.telegram_id.in_(telegram_ids),
+                    )
+                    .values(status=status)
+                )
+        await session.execute(
+            update(BroadcastJob)
+            .where(BroadcastJob.id == job.id)
+            .values(
+                sent=BroadcastJob.sent + report.delivered,
+                failed=BroadcastJob.failed + report.failed,
+                blocked=BroadcastJob.blocked + report.blocked,
+            )
+        )
+        await session.commit()
+    return True
+
+
+async def _undelivered_ids(session, job_id: int, status: str) -> list[int]:
+    stmt = (
+        select(BroadcastRecipient.telegram_id)
+        .where(
+            BroadcastRecipient.job_id == job_id,
+            BroadcastRecipient.status == status,
+        )
+        .limit(REPORT_IDS_LIMIT)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def process_job(bot: Bot, job_id: int):
+    """
+    Доводит рассылку до конца. Продолжает с первого получателя в статусе
+    pending, поэтому после перезапуска повторно отправится не больше одной порции.
+    Если инстанс перестал быть лидером, останавливается — рассылку продолжит новый лидер.
+    """
+    async with AsyncSessionLocal() as session:
+        job = await session.get(BroadcastJob, job_id)
+        if job.status == "pending":
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            await session.commit()
+        else:
+            logging.info("[Broadcast] Продолжаем рассылку #%s после перезапуска.", job_id)
+
+    sender = OutboundSender(bot)
+    while await _process_chunk(sender, job):
+        if not leader.is_leader:
+            logging.info("[Broadcast] Рассылку #%s продолжит новый лидер.", job_id)
+            return
+
+    async with AsyncSessionLocal() as session:
+        job = await session.get(BroadcastJob, job_id)
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        await session.commit()
+        failed_ids = await _undelivered_ids(session, job_id, "failed")
+        blocked_ids = await _undelivered_ids(session, job_id, "blocked")
+
+    logging.info("[Broadcast] Рассылка #%s завершена: %s/%s", job_id, job.sent, job.total)
+    reply = "✅ Рассылка завершена.\n" + format_job_status(job)
+    if failed_ids:
+        reply += "\n❗️ Не удалось доставить:\n" + ", ".join(str(uid) for uid in failed_ids)
+    if blocked_ids:
+        reply += "\n🚫 Бот заблокирован пользователями:\n" + ", ".join(str(uid) for uid in blocked_ids)
+    try:
+        await bot.send_message(job.admin_chat_id, reply, parse_mode="HTML")
+    except Exception:
+        logging.exception("[Broadcast] Не удалось отправить отчёт администратору %s", job.admin_chat_id)
+
+
+async def broadcast_worker(bot: Bot):
+    """
+    Фоновый цикл: по очереди выполняет незавершённые рассылки из БД.
+    Работает только на лидере, чтобы рассылку не отправили несколько инстансов.
+    """
+    while True:
+        try:
+            _wakeup.clear()
+            job_id = await _next_job_id() if leader.is_leader else None
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), BROADCAST_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await process_job(bot, job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("[Broadcast] Ошибка воркера рассылок")
+            await asyncio.sleep(BROADCAST_POLL_INTERVAL)
@@ -9,3 +9,120 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Админы: список int, даже если .env содержит строку
 ADMINS = list(map(int, os.getenv("ADMINS", "").split(",")))
+
+# Исходящие сообщения: глобальный лимит Telegram (~30 сообщений в секунду),
+# число одновременных отправок и пауза между сообщениями в один чат
+SEND_RATE_LIMIT = float(os.getenv("SEND_RATE_LIMIT", "30"))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "10"))
+SEND_PER_CHAT_INTERVAL = float(os.getenv("SEND_PER_CHAT_INTERVAL", "1"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+# Рассылки: сколько получателей обрабатываем за один шаг (контрольная точка)
+# и как часто воркер проверяет очередь рассылок (сек)
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "500"))
+BROADCAST_POLL_INTERVAL = float(os.getenv("BROADCAST_POLL_INTERVAL", "5"))
+
+# Кэш пользователей (telegram_id → User) в памяти процесса
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+# Режим получения апдейтов: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Webhook: публичный адрес бота (например, https://bot.example.com),
+# путь, адрес и порт локального сервера, секрет для заголовка Telegram
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+
+# Сколько апдейтов обрабатываем одновременно
+UPDATES_CONCURRENCY = int(os.getenv("UPDATES_CONCURRENCY", "100"))
+
+# Хранилище FSM: sql (общая таблица в БД) или memory (в памяти процесса).
+# Незавершённые диалоги старше FSM_TTL секунд удаляются.
+# FSM_CACHE_SIZE > 0 включает кэш в памяти — только для одного инстанса
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sql")
+FSM_TTL = int(os.getenv("FSM_TTL", "86400"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "0"))
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "60"))
+
+# Напоминания рассылаются порциями: раз в REMINDER_BUCKET_MINUTES минут
+# обрабатываются пользователи, чьё время напоминания попало в этот интервал
+REMINDER_BUCKET_MINUTES = int(os.getenv("REMINDER_BUCKET_MINUTES", "5"))
+# Интервалы должны ровно укладываться в час (cron */N и floor_time), иначе
+# на стыке часов слоты пропускаются или обрабатываются дважды
+if REMINDER_BUCKET_MINUTES <= 0 or 60 % REMINDER_BUCKET_MINUTES:
+    raise ValueError(
+        f"REMINDER_BUCKET_MINUTES={REMINDER_BUCKET_MINUTES}: нужен делитель 60 "
+        "(1, 2, 3, 4, 5, 6, 10, 12, 15, 20, 30 или 60)"
+    )
+
+# Несколько инстансов: на сколько частей (по user.id) делятся напоминания —
+# части разбирают свободные инстансы; за сколько минут назад догоняются
+# пропущенные интервалы; срок аренды лидера (сек); через сколько секунд без
+# продления незавершённый запуск упавшего инстанса можно взять заново.
+# BOT_INSTANCES — число запущенных инстансов: лимит SEND_RATE_LIMIT общий
+# для бота, поэтому каждый инстанс отправляет SEND_RATE_LIMIT / BOT_INSTANCES
+BOT_INSTANCES = max(int(os.getenv("BOT_INSTANCES", "1")), 1)
+SCHEDULER_PARTITIONS = int(os.getenv("SCHEDULER_PARTITIONS", "1"))
+SCHEDULER_CATCHUP_MINUTES = int(os.getenv("SCHEDULER_CATCHUP_MINUTES", "60"))
+SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "60"))
+SCHEDULER_RUN_TIMEOUT = int(os.getenv("SCHEDULER_RUN_TIMEOUT", "1800"))
+
+# Пул соединений с БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Размер кэша подготовленных выражений asyncpg на одно соединение
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# Метрики в формате Prometheus (http://METRICS_HOST:METRICS_PORT/metrics).
+# METRICS_PORT=0 выключает сервер метрик
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Импорт задач из файла (/import): максимальный размер файла (байт)
+# и максимум задач за один импорт
+IMPORT_MAX_FILE_SIZE = int(os.getenv("IMPORT_MAX_FILE_SIZE", str(5 * 1024 * 1024)))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "1000"))
+
+# Кэш отрисованных страниц /list (по версии списка задач) и сколько
+# секунд помним последнее сообщение со списком, чтобы обновлять его на месте
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "10000"))
+LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", "600"))
+LIST_MESSAGE_TTL = float(os.getenv("LIST_MESSAGE_TTL", "86400"))
+
+# Групповой коммит изменений задач: окно сбора в миллисекундах
+# (0 — выключено, каждое изменение коммитится сразу) и максимум изменений в пачке.
+# Работает только на PostgreSQL, на других базах выключается (write_coalescer)
+WRITE_COALESCE_MS = float(os.getenv("WRITE_COALESCE_MS", "0"))
+WRITE_COALESCE_MAX_BATCH = int(os.getenv("WRITE_COALESCE_MAX_BATCH", "100"))
+
+# Архив выполненных задач: через сколько дней после выполнения задача
+# уходит из Task в TaskArchive (0 — не архивировать), сколько задач
+# переносится одной транзакцией и максимум пачек за запуск архиватора (раз в час)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_MAX_BATCHES = int(os.getenv("ARCHIVE_MAX_BATCHES", "100"))
+
+# Ограничение частоты запросов пользователя: пополнение токенов в секунду
+# (0 — выключено), запас на всплеск, стоимость команд (по умолчанию 1)
+# и окно, в котором повтор той же команды или кнопки отбрасывается (сек)
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))
+THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "10"))
+THROTTLE_COSTS = {
+    name.strip().lstrip("/").lower(): float(cost)
+    for name, cost in (
+        item.split("=", 1)
+        for item in os.getenv(
+            "THROTTLE_COSTS", "list=2,stats=3,trend=3,import=3,export=5,adminstats=3,users=3,broadcast=5"
+        ).split(",")
+        if item.strip()
+    )
+}
+THROTTLE_DUPLICATE_WINDOW = float(os.getenv("THROTTLE_DUPLICATE_WINDOW", "2"))
+THROTTLE_CACHE_SIZE = int(os.getenv("THROTTLE_CACHE_SIZE", "10000"))
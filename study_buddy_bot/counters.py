@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from sqlalchemy import select, update, func, or_
+from study_buddy_bot.db import AsyncSessionLocal, dialect_insert
+from study_buddy_bot.models import BotCounter, DailyCounter, User
+from study_buddy_bot.utils import msk_today
+
+# Сколько дней показывает /adminstats
+ADMIN_STATS_DAYS = 7
+
+
+async def bump_counters(session, day: date, with_total: bool = True, **amounts: int):
+    """
+    Прибавляет значения к дневным счётчикам (и к итогам, если with_total).
+    Вызывается в сессии самого события и коммитится вместе с ним.
+    """
+    amounts = {name: amount for name, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    daily = dialect_insert(DailyCounter).values(
+        [{"day": day, "name": name, "value": amount} for name, amount in amounts.items()]
+    )
+    daily = daily.on_conflict_do_update(
+        index_elements=[DailyCounter.day, DailyCounter.name],
+        set_={"value": DailyCounter.value + daily.excluded.value},
+    )
+    await session.execute(daily)
+    if not with_total:
+        return
+    total = dialect_insert(BotCounter).values(
+        [{"name": name, "value": amount} for name, amount in amounts.items()]
+    )
+    total = total.on_conflict_do_update(
+        index_elements=[BotCounter.name],
+        set_={"value": BotCounter.value + total.excluded.value},
+    )
+    await session.execute(total)
+
+
+async def record_counters(day: date, **amounts: int):
+    """То же в отдельной транзакции — для событий вне сессии (напоминания)."""
+    async with AsyncSessionLocal() as session:
+        await bump_counters(session, day, **amounts)
+        await session.commit()
+
+
+async def mark_active(user: User):
+    """
+    Отмечает пользователя активным сегодня. Пишет в БД не чаще раза в день
+    на пользователя; счётчик DAU увеличивает только тот инстанс, чей UPDATE
+    действительно сменил день.
+    """
+    today = msk_today()
+    if user.last_active_day == today:
+        return
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(User)
+            .where(User.id == user.id, or_(User.last_active_day.is_(None), User.last_active_day < today))
+            .values(last_active_day=today)
+        )
+        if result.rowcount:
+            await bump_counters(session, today, with_total=False, active_users=1)
+        await session.commit()
+    # Объект из кэша пользователей: обновляем, чтобы не писать повторно
+    user.last_active_day = today
+
+
+async def get_admin_stats(session, today: date, days: int = ADMIN_STATS_DAYS) -> dict:
+    """
+    Сводка для /adminstats: итоги, дневные счётчики за `days` дней и WAU.
+    Читает несколько строк счётчиков и диапазон индекса по last_active_day.
+    """
+    since = today - timedelta(days=days - 1)
+    totals = dict((await session.execute(select(BotCounter.name, BotCounter.value))).all())
+
+    daily: dict[date, dict[str, int]] = {since + timedelta(days=i): {} for i in range(days)}
+    result = await session.execute(
+        select(DailyCounter.day, DailyCounter.name, DailyCounter.value)
+        .where(DailyCounter.day >= since, DailyCounter.day <= today)
+    )
+    for day, name, value in result:
+        daily[day][name] = value
+
+    wau = (await session.execute(
+        select(func.count()).select_from(User).where(User.last_active_day >= today - timedelta(days=6))
+    )).scalar_one()
+    return {"totals": totals, "daily": daily, "wau": wau}
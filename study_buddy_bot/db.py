@@ -1,11 +1,73 @@
+import logging
+import time
+from dataclasses import dataclass
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from study_buddy_bot.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+)
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Пул, который считает время ожидания соединения и таймауты,
+    чтобы размер пула подбирать по данным.
+    """
+
+    metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.metrics.checkouts += 1
+            self.metrics.wait_total += waited
+            self.metrics.wait_max = max(self.metrics.wait_max, waited)
+
+
+def engine_options(url: str) -> dict:
+    options = dict(
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if make_url(url).get_backend_name() == "postgresql":
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
 
-from study_buddy_bot.config import DATABASE_URL
 
 # Создаём асинхронный движок для подключения к PostgreSQL
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Создаём асинхронную фабрику сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -18,3 +80,38 @@ AsyncSessionLocal = async_sessionmaker(
 async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+# INSERT с поддержкой ON CONFLICT для текущей СУБД (PostgreSQL или SQLite)
+def dialect_insert(model):
+    if engine.dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
+def pool_stats() -> dict:
+    """
+    Текущее состояние пула и накопленные метрики ожидания соединений.
+    """
+    pool = engine.pool
+    metrics = InstrumentedPool.metrics
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "wait_avg_ms": metrics.wait_total / metrics.checkouts * 1000 if metrics.checkouts else 0.0,
+        "wait_max_ms": metrics.wait_max * 1000,
+    }
+
+
+def log_pool_stats():
+    """Пишет состояние пула в лог и сбрасывает пиковое ожидание (запускается планировщиком)."""
+    stats = pool_stats()
+    logging.info(
+        "[DB] Пул: занято %s/%s, overflow %s, ожидание avg %.1f мс / max %.1f мс, таймаутов %s",
+        stats["checked_out"], stats["size"], stats["overflow"],
+        stats["wait_avg_ms"], stats["wait_max_ms"], stats["timeouts"],
+    )
+    InstrumentedPool.metrics.wait_max = 0.0
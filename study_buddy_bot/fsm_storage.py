@@ -0,0 +1,118 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import select, delete, case
+from study_buddy_bot.models import FSMRecord
+from study_buddy_bot.db import AsyncSessionLocal, dialect_insert
+from study_buddy_bot.config import FSM_TTL, FSM_CACHE_SIZE, FSM_CACHE_TTL
+from study_buddy_bot.utils import TTLCache
+
+
+class SQLStorage(BaseStorage):
+    """
+    FSM-хранилище в общей БД: одна строка (state, data) на диалог, запись
+    через upsert. Диалоги, которые не менялись дольше `ttl`, считаются
+    брошенными: они не читаются и удаляются delete_expired().
+
+    Кэш (cache_size > 0) работает как write-through и безопасен только
+    при одном инстансе: другие реплики не сбрасывают его при записи.
+    """
+
+    def __init__(self, ttl: int = FSM_TTL, cache_size: int = FSM_CACHE_SIZE, cache_ttl: float = FSM_CACHE_TTL):
+        self.ttl = timedelta(seconds=ttl)
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache = TTLCache(cache_size, cache_ttl) if cache_size > 0 else None
+
+    async def _load(self, key: str) -> tuple[Optional[str], Dict[str, Any]]:
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not TTLCache.MISSING:
+                return cached
+        async with AsyncSessionLocal() as session:
+            stmt = select(FSMRecord.state, FSMRecord.data).where(
+                FSMRecord.key == key,
+                FSMRecord.updated_at >= datetime.utcnow() - self.ttl,
+            )
+            row = (await session.execute(stmt)).one_or_none()
+        record = (row.state, json.loads(row.data)) if row else (None, {})
+        if self._cache is not None:
+            self._cache.set(key, record)
+        return record
+
+    async def _save(self, key: str, field: str, value):
+        """
+        Upsert одного поля (state или data). Если старая запись уже протухла,
+        второе поле сбрасывается, чтобы брошенный диалог не «ожил».
+        Пустая запись (нет состояния и данных) удаляется, чтобы таблица
+        хранила только активные диалоги.
+        """
+        now = datetime.utcnow()
+        cutoff = now - self.ttl
+        if field == "state":
+            other, empty = FSMRecord.data, "{}"
+        else:
+            other, empty = FSMRecord.state, None
+        async with AsyncSessionLocal() as session:
+            stmt = dialect_insert(FSMRecord).values(key=key, updated_at=now, **{field: value})
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[FSMRecord.key],
+                set_={
+                    field: value,
+                    other.key: case((FSMRecord.updated_at < cutoff, empty), else_=other),
+                    "updated_at": now,
+                },
+            )
+            await session.execute(stmt)
+            await session.execute(
+                delete(FSMRecord).where(
+                    FSMRecord.key == key,
+                    FSMRecord.state.is_(None),
+                    FSMRecord.data == "{}",
+                )
+            )
+            await session.commit()
+
+    def _update_cache(self, key: str, field: str, value):
+        if self._cache is None:
+            return
+        cached = self._cache.get(key)
+        if cached is TTLCache.MISSING:
+            return
+        state, data = cached
+        self._cache.set(key, (value, data) if field == "state" else (state, value))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        state = state.state if isinstance(state, State) else state
+        await self._save(storage_key, "state", state)
+        self._update_cache(storage_key, "state", state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        data = dict(data)
+        await self._save(storage_key, "data", json.dumps(data, ensure_ascii=False))
+        self._update_cache(storage_key, "data", data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    async def delete_expired(self):
+        """Удаляет брошенные диалоги (запускается планировщиком)."""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(FSMRecord).where(FSMRecord.updated_at < datetime.utcnow() - self.ttl)
+            )
+            await session.commit()
+        if result.rowcount:
+            logging.info("[FSM] Удалено брошенных диалогов: %s", result.rowcount)
+
+    async def close(self) -> None:
+        pass
@@ -1,7 +1,6 @@
-import asyncio
 import re
+import time
 import logging
-from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
@@ -9,21 +8,32 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from study_buddy_bot.models import User
 from study_buddy_bot.db import AsyncSessionLocal
 from study_buddy_bot.config import ADMINS
-from sqlalchemy import select
+from study_buddy_bot.broadcasts import create_broadcast_job, get_broadcast_job, format_job_status
+from study_buddy_bot.counters import get_admin_stats
+from study_buddy_bot.utils import msk_today
+from sqlalchemy import select, func
 
 
 router = Router()
 
-batch_size = 20
-delay = 1
-
 PAGE_SIZE = 10
 
+# Сколько секунд держим закэшированное общее число пользователей
+USERS_TOTAL_TTL = 60
+
+_users_total_cache = (0, 0.0)  # (значение, момент устаревания)
+
 
-def build_users_keyboard(page: int, total: int):
+def build_users_keyboard(page: int, first_id: int | None, last_id: int | None, has_next: bool):
+    """
+    Кнопки навигации. В callback_data кладём номер страницы и id пограничного
+    пользователя, чтобы следующая страница выбиралась по индексу (keyset).
+    """
     builder = InlineKeyboardBuilder()
-    if (page + 1) * PAGE_SIZE < total:
-        builder.button(text="▶️ Далее", callback_data=f"users_page_{page + 1}")
+    if page > 0 and first_id is not None:
+        builder.button(text="◀️ Назад", callback_data=f"users_page_{page - 1}_prev_{first_id}")
+    if has_next:
+        builder.button(text="▶️ Далее", callback_data=f"users_page_{page + 1}_next_{last_id}")
     builder.button(text="❌ Выйти", callback_data="users_exit")
     return builder.as_markup()
 
@@ -32,16 +42,53 @@ def is_admin(user_id: int) -> bool:
     return user_id in ADMINS
 
 
-async def safe_send(bot, user_id, text):
-    try:
-        await bot.send_message(user_id, text)
-        return True
-    except (TelegramForbiddenError, TelegramBadRequest):
-        logging.warning("Пользователь %s недоступен для рассылки.", user_id)
-        return False
-    except Exception:
-        logging.exception("Ошибка при отправке %s", user_id)
-        return False
+async def get_users_total(session) -> int:
+    global _users_total_cache
+    total, expires_at = _users_total_cache
+    if time.monotonic() < expires_at:
+        return total
+    result = await session.execute(select(func.count()).select_from(User))
+    total = result.scalar_one()
+    _users_total_cache = (total, time.monotonic() + USERS_TOTAL_TTL)
+    return total
+
+
+async def fetch_users_page(session, after_id: int | None = None, before_id: int | None = None):
+    """
+    Возвращает (пользователи страницы, есть ли следующая страница).
+    Запрашиваем PAGE_SIZE + 1 строк, лишняя строка говорит о наличии продолжения.
+    """
+    if before_id is not None:
+        stmt = (
+            select(User)
+            .where(User.id < before_id)
+            .order_by(User.id.desc())
+            .limit(PAGE_SIZE)
+        )
+        result = await session.execute(stmt)
+        return list(reversed(result.scalars().all())), True
+
+    stmt = select(User).order_by(User.id).limit(PAGE_SIZE + 1)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    result = await session.execute(stmt)
+    users = result.scalars().all()
+    return users[:PAGE_SIZE], len(users) > PAGE_SIZE
+
+
+async def render_users_page(page: int, after_id: int | None = None, before_id: int | None = None):
+    async with AsyncSessionLocal() as session:
+        users_page, has_next = await fetch_users_page(session, after_id, before_id)
+        total = await get_users_total(session)
+
+    text = "<b>Пользователи:</b>\n"
+    for u in users_page:
+        text += f"id: <code>{u.telegram_id}</code> | @{u.username or '-'}\n"
+    text += f"\nПоказано {page * PAGE_SIZE + 1}–{page * PAGE_SIZE + len(users_page)} из {total}"
+
+    first_id = users_page[0].id if users_page else None
+    last_id = users_page[-1].id if users_page else None
+    return text, build_users_keyboard(page, first_id, last_id, has_next)
 
 
 @router.message(Command("users"))
@@ -50,23 +97,8 @@ async def users_count(message: Message):
         await message.answer("⛔️ У тебя нет прав для этой команды.")
         return
     try:
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).order_by(User.id)
-            result = await session.execute(stmt)
-            users = result.scalars().all()
-
-        page = 0
-        total = len(users)
-        users_page = users[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
-        text = "<b>Пользователи:</b>\n"
-        for u in users_page:
-            text += f"id: <code>{u.telegram_id}</code> | @{u.username or '-'}\n"
-        text += f"\nПоказано {page * PAGE_SIZE + 1}–{page * PAGE_SIZE + len(users_page)} из {total}"
-
-        await message.answer(
-            text, parse_mode="HTML",
-            reply_markup=build_users_keyboard(page, total),
-        )
+        text, markup = await render_users_page(0)
+        await message.answer(text, parse_mode="HTML", reply_markup=markup)
     except Exception:
         logging.exception("Failed to handle /users")
         await message.answer("Не удалось получить список пользователей. Попробуй позже.")
@@ -75,24 +107,13 @@ async def users_count(message: Message):
 @router.callback_query(F.data.startswith("users_page_"))
 async def users_next_page(callback: CallbackQuery):
     try:
-        page = int(callback.data.split("_")[-1])
+        _, _, page, direction, cursor = callback.data.split("_")
+        if direction == "prev":
+            text, markup = await render_users_page(int(page), before_id=int(cursor))
+        else:
+            text, markup = await render_users_page(int(page), after_id=int(cursor))
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).order_by(User.id)
-            result = await session.execute(stmt)
-            users = result.scalars().all()
-
-        total = len(users)
-        users_page = users[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
-        text = "<b>Пользователи:</b>\n"
-        for u in users_page:
-            text += f"id: <code>{u.telegram_id}</code> | @{u.username or '-'}\n"
-        text += f"\nПоказано {page * PAGE_SIZE + 1}–{page * PAGE_SIZE + len(users_page)} из {total}"
-
-        await callback.message.edit_text(
-            text, parse_mode="HTML",
-            reply_markup=build_users_keyboard(page, total),
-        )
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
         await callback.answer()
     except Exception:
         logging.exception("Failed to paginate users")
@@ -145,34 +166,12 @@ async def broadcast(message: Message):
             await message.answer("Текст сообщения не должен быть пустым.")
             return
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(User)
-            if ids:
-                stmt = stmt.where(User.telegram_id.in_(ids))
-            result = await session.execute(stmt)
-            users = result.scalars().all()
-
-        invalid_ids = []
-        if ids:
-            users_id_set = {u.telegram_id for u in users}
-            invalid_ids = [uid for uid in ids if uid not in users_id_set]
-
-        count = 0
-        failed = []
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i + batch_size]
-            tasks = [safe_send(message.bot, user.telegram_id, text) for user in batch]
-            results = await asyncio.gather(*tasks)
-            for idx, ok in enumerate(results):
-                if ok:
-                    count += 1
-                else:
-                    failed.append(batch[idx].telegram_id)
-            await asyncio.sleep(delay)
-
-        reply = f"Сообщение отправлено {count} пользователям."
-        if failed:
-            reply += "\n❗️ Не удалось доставить:\n" + ", ".join(str(uid) for uid in failed)
+        job, invalid_ids = await create_broadcast_job(message.chat.id, text, ids)
+
+        reply = (
+            f"Рассылка #{job.id} поставлена в очередь: {job.total} получателей.\n"
+            f"Прогресс: /broadcast_status {job.id}"
+        )
         if invalid_ids:
             reply += "\n‼️ Эти id не зарегистрированы в системе:\n" + ", ".join(str(uid) for uid in invalid_ids)
         await message.answer(reply)
@@ -180,3 +179,73 @@ async def broadcast(message: Message):
         logging.exception("Failed to broadcast message")
         await message.answer("Не удалось выполнить рассылку. Попробуй позже.")
 
+
+@router.message(Command("broadcast_status"))
+async def broadcast_status(message: Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔️ У тебя нет прав для этой команды.")
+        return
+    try:
+        parts = message.text.strip().split(maxsplit=1)
+        if len(parts) > 1 and not parts[1].isdigit():
+            await message.answer("Укажи номер рассылки: /broadcast_status &lt;номер&gt;")
+            return
+        job = await get_broadcast_job(int(parts[1]) if len(parts) > 1 else None)
+        if job is None:
+            await message.answer("Рассылка не найдена.")
+            return
+        await message.answer(format_job_status(job), parse_mode="HTML")
+    except Exception:
+        logging.exception("Failed to get broadcast status")
+        await message.answer("Не удалось получить статус рассылки. Попробуй позже.")
+
+
+def percent(part: int, whole: int) -> str:
+    return f"{part / whole * 100:.0f}%" if whole else "—"
+
+
+def format_admin_stats(stats: dict, today) -> str:
+    totals, daily = stats["totals"], stats["daily"]
+    created_total = totals.get("tasks_created", 0)
+    done_total = totals.get("tasks_done", 0)
+
+    text = (
+        "<b>Статистика бота</b>\n"
+        f"Пользователей: <b>{totals.get('users', 0)}</b>\n"
+        f"Активных сегодня (DAU): <b>{daily[today].get('active_users', 0)}</b>\n"
+        f"Активных за 7 дней (WAU): <b>{stats['wau']}</b>\n"
+        f"Задач создано: <b>{created_total}</b>, выполнено: <b>{done_total}</b> "
+        f"({percent(done_total, created_total)})\n"
+        "\n<b>По дням</b> (новые польз. / активные / задач создано / выполнено):\n"
+    )
+    delivered = blocked = failed = 0
+    for day, counters in sorted(daily.items(), reverse=True):
+        text += (
+            f"{day.strftime('%d.%m')}: {counters.get('users', 0)} / {counters.get('active_users', 0)} / "
+            f"{counters.get('tasks_created', 0)} / {counters.get('tasks_done', 0)}\n"
+        )
+        delivered += counters.get("reminders_delivered", 0)
+        blocked += counters.get("reminders_blocked", 0)
+        failed += counters.get("reminders_failed", 0)
+
+    attempted = delivered + blocked + failed
+    text += (
+        f"\n<b>Напоминания за {len(daily)} дней:</b> доставлено {delivered} из {attempted} "
+        f"({percent(delivered, attempted)}), заблокировали бота {blocked}, ошибок {failed}"
+    )
+    return text
+
+
+@router.message(Command("adminstats"))
+async def admin_stats(message: Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔️ У тебя нет прав для этой команды.")
+        return
+    try:
+        today = msk_today()
+        async with AsyncSessionLocal() as session:
+            stats = await get_admin_stats(session, today)
+        await message.answer(format_admin_stats(stats, today), parse_mode="HTML")
+    except Exception:
+        logging.exception("Failed to get admin stats")
+        await message.answer("Не удалось получить статистику. Попробуй позже.")
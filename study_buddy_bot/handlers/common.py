@@ -4,6 +4,10 @@ from aiogram.filters import Command
 from aiogram.types import Message
 from study_buddy_bot.models import User
 from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.middlewares.user import invalidate_user
+from study_buddy_bot.counters import bump_counters
+from study_buddy_bot.scheduler import default_reminder_minute, reminder_slot
+from study_buddy_bot.utils import msk_today
 from sqlalchemy import select
 from datetime import datetime, timedelta
 
@@ -12,33 +16,44 @@ router = Router()
 
 
 @router.message(Command("start"))
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, user: User | None):
     try:
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-
-            if user is None:
-                user = User(
-                    telegram_id=message.from_user.id,
-                    first_name=message.from_user.first_name,
-                    username=message.from_user.username,
-                    registered_at=datetime.utcnow() + timedelta(hours=3),
-                )
-                session.add(user)
-                await session.commit()
-                text = (
-                    f"Привет, {message.from_user.first_name}! 👋\n"
-                    f"Я — StudyBuddyBot. Помогу тебе отслеживать задачи, напоминать о дедлайнах и вести статистику.\n"
-                    f"Отправь /help, чтобы узнать больше."
-                )
-            else:
-                text = (
-                    f"С возвращением, {user.first_name or 'друг'}!\n"
-                    f"Готов продолжать помогать тебе в учёбе. Отправь /help для справки."
-                )
-            await message.answer(text)
+        is_new = False
+        if user is None:
+            # Промахи не кэшируются, user=None — свежий ответ БД; перепроверка в той же
+            # сессии лишь сужает окно гонки двух одновременных /start
+            async with AsyncSessionLocal() as session:
+                stmt = select(User).where(User.telegram_id == message.from_user.id)
+                result = await session.execute(stmt)
+                user = result.scalar_one_or_none()
+
+                if user is None:
+                    user = User(
+                        telegram_id=message.from_user.id,
+                        first_name=message.from_user.first_name,
+                        username=message.from_user.username,
+                        registered_at=datetime.utcnow() + timedelta(hours=3),
+                        reminder_minute=default_reminder_minute(message.from_user.id),
+                    )
+                    user.reminder_slot = reminder_slot(user.timezone, user.reminder_minute)
+                    session.add(user)
+                    await bump_counters(session, msk_today(), users=1)
+                    await session.commit()
+                    is_new = True
+            invalidate_user(message.from_user.id)
+
+        if is_new:
+            text = (
+                f"Привет, {message.from_user.first_name}! 👋\n"
+                f"Я — StudyBuddyBot. Помогу тебе отслеживать задачи, напоминать о дедлайнах и вести статистику.\n"
+                f"Отправь /help, чтобы узнать больше."
+            )
+        else:
+            text = (
+                f"С возвращением, {user.first_name or 'друг'}!\n"
+                f"Готов продолжать помогать тебе в учёбе. Отправь /help для справки."
+            )
+        await message.answer(text)
     except Exception:
         logging.exception("Failed to handle /start")
         await message.answer("Упс, произошла ошибка. Попробуй позже.")
@@ -50,9 +65,14 @@ async def cmd_help(message: Message):
         text = (
             "📚 <b>Доступные команды:</b>\n"
             "/add &lt;текст&gt; — добавить задачу (дедлайн — сегодня)\n"
-            "/list — список твоих задач\n"
+            "/list [open|done|overdue|archive] — список твоих задач\n"
             "/done &lt;номер&gt; — отметить задачу выполненной\n"
-            "/stats — статистика за неделю\n"
+            "/stats [дней] — статистика за неделю или за указанный период\n"
+            "/trend — динамика по неделям и серия дней с выполненными задачами\n"
+            "/remind [ЧЧ:ММ|off] — время напоминаний о задачах на завтра\n"
+            "/timezone [пояс] — часовой пояс, например Europe/Moscow\n"
+            "/import — загрузить задачи из файла CSV или ICS\n"
+            "/export [csv|ics] — выгрузить все задачи в файл\n"
             "/help — эта справка"
         )
         await message.answer(text, parse_mode="HTML")
@@ -0,0 +1,127 @@
+import logging
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from study_buddy_bot.models import User
+from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.middlewares.user import invalidate_user
+from study_buddy_bot.scheduler import MINUTES_PER_DAY, reminder_slot, utc_offset_minutes
+from sqlalchemy import case, select, update
+from datetime import datetime
+
+
+router = Router()
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def format_settings(user: User) -> str:
+    reminder = format_minute(user.reminder_minute) if user.reminder_slot is not None else "выключены"
+    return (
+        f"Часовой пояс: <b>{user.timezone}</b>\n"
+        f"Напоминания о задачах на завтра: <b>{reminder}</b>"
+    )
+
+
+async def save_settings(user: User, **values):
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(User).where(User.id == user.id).values(**values))
+        await session.commit()
+    invalidate_user(user.telegram_id)
+
+
+async def save_reminder_time(user: User, minute: int) -> str:
+    """
+    Сохраняет время напоминания и возвращает часовой пояс, по которому
+    посчитан слот. Пояс читается из БД под блокировкой строки: в кэше
+    пользователей этого инстанса он может быть устаревшим.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User.timezone).where(User.id == user.id).with_for_update()
+        )
+        timezone = result.scalar_one()
+        await session.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(reminder_minute=minute, reminder_slot=reminder_slot(timezone, minute))
+        )
+        await session.commit()
+    invalidate_user(user.telegram_id)
+    return timezone
+
+
+@router.message(Command("timezone"))
+async def set_timezone(message: Message, user: User | None, command: CommandObject):
+    try:
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+        if not command.args:
+            await message.answer(
+                format_settings(user) + "\n\nИзменить: /timezone Europe/Moscow",
+                parse_mode="HTML",
+            )
+            return
+
+        timezone = command.args.strip()
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            await message.answer("Неизвестный часовой пояс. Пример: /timezone Asia/Yekaterinburg")
+            return
+
+        # Слот считаем в том же UPDATE из значений в БД, а не из кэша
+        # пользователей — его могли изменить на другом инстансе
+        offset = utc_offset_minutes(timezone)
+        await save_settings(
+            user,
+            timezone=timezone,
+            reminder_slot=case(
+                (User.reminder_slot.is_(None), None),
+                else_=(User.reminder_minute - offset + MINUTES_PER_DAY) % MINUTES_PER_DAY,
+            ),
+        )
+        await message.answer(f"Часовой пояс изменён на <b>{timezone}</b>.", parse_mode="HTML")
+    except Exception:
+        logging.exception("Failed to set timezone")
+        await message.answer("Не удалось изменить часовой пояс. Попробуй позже.")
+
+
+@router.message(Command("remind"))
+async def set_reminder_time(message: Message, user: User | None, command: CommandObject):
+    try:
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+        if not command.args:
+            await message.answer(
+                format_settings(user) + "\n\nИзменить: /remind 20:30, выключить: /remind off",
+                parse_mode="HTML",
+            )
+            return
+
+        value = command.args.strip().lower()
+        if value == "off":
+            await save_settings(user, reminder_slot=None)
+            await message.answer("Напоминания выключены. Включить: /remind 19:00")
+            return
+
+        try:
+            parsed = datetime.strptime(value, "%H:%M")
+        except ValueError:
+            await message.answer("Укажи время в формате ЧЧ:ММ, например: /remind 20:30")
+            return
+
+        minute = parsed.hour * 60 + parsed.minute
+        timezone = await save_reminder_time(user, minute)
+        await message.answer(
+            f"Буду напоминать о задачах на завтра в <b>{format_minute(minute)}</b> ({timezone}).",
+            parse_mode="HTML",
+        )
+    except Exception:
+        logging.exception("Failed to set reminder time")
+        await message.answer("Не удалось изменить время напоминаний. Попробуй позже.")
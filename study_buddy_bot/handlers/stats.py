@@ -2,56 +2,89 @@ import logging
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
-from study_buddy_bot.models import User, Task
+from study_buddy_bot.models import User
 from study_buddy_bot.db import AsyncSessionLocal
-from sqlalchemy import select, or_
-from datetime import datetime, timedelta
+from study_buddy_bot.utils import msk_today, plural_days
+from study_buddy_bot.stats_rollup import sum_daily_stats, get_daily_stats
+from datetime import timedelta
 
 
 router = Router()
 
 
+# Период по умолчанию и максимальный период для /stats <дней>
+DEFAULT_PERIOD_DAYS = 7
+MAX_PERIOD_DAYS = 365
+
+# Сколько недель показывает /trend
+TREND_WEEKS = 4
+
+
 @router.message(Command("stats"))
-async def stats(message: Message):
+async def stats(message: Message, user: User | None):
     try:
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-            if not user:
-                await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+
+        parts = message.text.strip().split(maxsplit=1)
+        days = DEFAULT_PERIOD_DAYS
+        if len(parts) > 1:
+            if not parts[1].isdigit() or not 1 <= int(parts[1]) <= MAX_PERIOD_DAYS:
+                await message.answer(f"Укажи период в днях от 1 до {MAX_PERIOD_DAYS}: /stats 30")
                 return
+            days = int(parts[1])
+
+        since = msk_today() - timedelta(days=days - 1)
+        async with AsyncSessionLocal() as session:
+            added, done, open_tasks = await sum_daily_stats(session, user.id, since)
+
+        percent_done = f"{(done/added*100):.0f}%" if added > 0 else "—"
 
-            now = datetime.utcnow()
-            week_ago = now - timedelta(days=7)
-
-            stmt = (
-                select(Task)
-                .where(
-                    Task.user_id == user.id,
-                    or_(
-                        Task.created_at >= week_ago,
-                        Task.done_at >= week_ago,
-                    ),
-                )
-            )
-            result = await session.execute(stmt)
-            tasks = result.scalars().all()
-
-            added = sum(1 for t in tasks if t.created_at >= week_ago)
-            done = sum(1 for t in tasks if t.is_done and t.done_at and t.done_at >= week_ago)
-            open_tasks = sum(1 for t in tasks if not t.is_done and t.created_at >= week_ago)
-            percent_done = f"{(done/added*100):.0f}%" if added > 0 else "—"
-
-            msg = (
-                "<b>Статистика за 7 дней:</b>\n"
-                f"• Добавлено задач: <b>{added}</b>\n"
-                f"• Выполнено задач: <b>{done}</b>\n"
-                f"• Осталось невыполненных: <b>{open_tasks}</b>\n"
-                f"• Процент выполненных: <b>{percent_done}</b>"
-            )
-            await message.answer(msg, parse_mode="HTML")
+        msg = (
+            f"<b>Статистика за {days} {plural_days(days)}:</b>\n"
+            f"• Добавлено задач: <b>{added}</b>\n"
+            f"• Выполнено задач: <b>{done}</b>\n"
+            f"• Осталось невыполненных: <b>{open_tasks}</b>\n"
+            f"• Процент выполненных: <b>{percent_done}</b>"
+        )
+        await message.answer(msg, parse_mode="HTML")
     except Exception:
         logging.exception("Failed to gather stats")
         await message.answer("Не удалось получить статистику. Попробуй позже.")
 
+
+@router.message(Command("trend"))
+async def trend(message: Message, user: User | None):
+    try:
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+
+        today = msk_today()
+        async with AsyncSessionLocal() as session:
+            rows = await get_daily_stats(session, user.id, today - timedelta(days=MAX_PERIOD_DAYS - 1))
+        by_day = {row.day: row for row in rows}
+
+        msg = f"<b>Динамика за {TREND_WEEKS} недели:</b>\n"
+        for week in range(TREND_WEEKS - 1, -1, -1):
+            end = today - timedelta(days=week * 7)
+            start = end - timedelta(days=6)
+            week_rows = [r for r in rows if start <= r.day <= end]
+            added = sum(r.added for r in week_rows)
+            done = sum(r.done for r in week_rows)
+            msg += f"• {start:%d.%m}–{end:%d.%m}: добавлено <b>{added}</b>, выполнено <b>{done}</b>\n"
+
+        # Серия: дни подряд с хотя бы одной выполненной задачей.
+        # Сегодняшний день ещё не закончился, поэтому серия может начинаться со вчера
+        day = today if by_day.get(today) and by_day[today].done > 0 else today - timedelta(days=1)
+        streak = 0
+        while by_day.get(day) and by_day[day].done > 0:
+            streak += 1
+            day -= timedelta(days=1)
+        msg += f"\n🔥 Серия: <b>{streak}</b> {plural_days(streak)} подряд с выполненными задачами"
+
+        await message.answer(msg, parse_mode="HTML")
+    except Exception:
+        logging.exception("Failed to build trend")
+        await message.answer("Не удалось получить динамику. Попробуй позже.")
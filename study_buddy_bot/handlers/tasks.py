@@ -1,18 +1,210 @@
+import html
 import logging
 from aiogram import Router, F
-from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from study_buddy_bot.db import AsyncSessionLocal
-from study_buddy_bot.models import Task, User
-from sqlalchemy import select
+from study_buddy_bot.models import Task, TaskArchive, User
+from study_buddy_bot.list_cache import (
+    list_cache,
+    last_list_messages,
+    bump_tasks_version,
+    get_tasks_version,
+    remember_list_message,
+    forget_list_message,
+)
+from study_buddy_bot.stats_rollup import on_task_added, on_task_done, on_task_deleted
+from study_buddy_bot.utils import DeadlineInPastError, TTLCache, parse_deadline
+from study_buddy_bot.write_coalescer import run_write
+from sqlalchemy import select, func
 from datetime import datetime, date, timedelta
 
 
 router = Router()
 
 
+# Порядок задач в /list. id в конце делает порядок детерминированным,
+# чтобы номер из списка всегда указывал на ту же задачу
+TASK_ORDER = (Task.is_done, Task.deadline, Task.id)
+
+
+async def get_task_by_number(session, user_id: int, task_number: int) -> Task | None:
+    """
+    Находит задачу по её номеру в /list одним запросом (OFFSET n-1 LIMIT 1)
+    по индексу (user_id, is_done, deadline, id).
+    """
+    if task_number < 1:
+        return None
+    stmt = (
+        select(Task)
+        .where(Task.user_id == user_id)
+        .order_by(*TASK_ORDER)
+        .offset(task_number - 1)
+        .limit(1)
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+# Размер страницы /list и максимальная длина описания в списке,
+# чтобы сообщение гарантированно укладывалось в лимит Telegram (4096 символов)
+LIST_PAGE_SIZE = 10
+LIST_DESCRIPTION_LIMIT = 200
+
+# Фильтры /list: название кнопки
+LIST_FILTERS = {
+    "all": "Все",
+    "open": "Открытые",
+    "overdue": "Просроченные",
+    "done": "Выполненные",
+    "archive": "Архив",
+}
+
+
+def build_tasks_keyboard(task_filter: str, page: int, has_next: bool):
+    builder = InlineKeyboardBuilder()
+    for name, title in LIST_FILTERS.items():
+        mark = "• " if name == task_filter else ""
+        builder.button(text=f"{mark}{title}", callback_data=f"tasks_page_{name}_0")
+    if page > 0:
+        builder.button(text="◀️ Назад", callback_data=f"tasks_page_{task_filter}_{page - 1}")
+    if has_next:
+        builder.button(text="▶️ Далее", callback_data=f"tasks_page_{task_filter}_{page + 1}")
+    builder.adjust(2)
+    return builder.as_markup()
+
+
+async def render_archive_page(user_id: int, page: int):
+    """
+    Страница архива: выполненные задачи, перенесённые из Task, от новых
+    к старым. Номеров нет — /done, /edit и /delete к ним не применяются.
+    """
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            select(TaskArchive)
+            .where(TaskArchive.user_id == user_id)
+            .order_by(TaskArchive.done_at.desc(), TaskArchive.id.desc())
+            .offset(page * LIST_PAGE_SIZE)
+            .limit(LIST_PAGE_SIZE + 1)
+        )
+        tasks = (await session.execute(stmt)).scalars().all()
+
+    has_next = len(tasks) > LIST_PAGE_SIZE
+    tasks = tasks[:LIST_PAGE_SIZE]
+    if not tasks and page == 0:
+        return "<b>Архив:</b> задач нет.", build_tasks_keyboard("archive", 0, False)
+
+    msg = "<b>Архив выполненных задач:</b>\n"
+    for task in tasks:
+        description = task.description
+        if len(description) > LIST_DESCRIPTION_LIMIT:
+            description = description[:LIST_DESCRIPTION_LIMIT] + "…"
+        done_at = f", выполнена {task.done_at:%Y-%m-%d}" if task.done_at else ""
+        msg += f"• <b>{html.escape(description)}</b> (до {task.deadline:%Y-%m-%d}{done_at})\n"
+    if page > 0 or has_next:
+        msg += f"\nСтраница {page + 1}"
+    return msg, build_tasks_keyboard("archive", page, has_next)
+
+
+async def render_task_page(user_id: int, task_filter: str, page: int):
+    """
+    Собирает одну страницу /list: LIMIT/OFFSET-запрос на LIST_PAGE_SIZE + 1 строк.
+    Номера задач совпадают с номерами для /done, /edit и /delete: открытые задачи
+    идут первыми (просроченные — в самом начале), выполненные — после них.
+    """
+    if task_filter == "archive":
+        return await render_archive_page(user_id, page)
+    today = date.today()
+    conditions = [Task.user_id == user_id]
+    first_number = 1
+    async with AsyncSessionLocal() as session:
+        if task_filter == "open":
+            conditions.append(Task.is_done == False)
+        elif task_filter == "overdue":
+            conditions += [Task.is_done == False, Task.deadline < today]
+        elif task_filter == "done":
+            conditions.append(Task.is_done == True)
+            stmt = select(func.count()).where(Task.user_id == user_id, Task.is_done == False)
+            first_number += (await session.execute(stmt)).scalar_one()
+
+        stmt = (
+            select(Task)
+            .where(*conditions)
+            .order_by(*TASK_ORDER)
+            .offset(page * LIST_PAGE_SIZE)
+            .limit(LIST_PAGE_SIZE + 1)
+        )
+        result = await session.execute(stmt)
+        tasks = result.scalars().all()
+
+    has_next = len(tasks) > LIST_PAGE_SIZE
+    tasks = tasks[:LIST_PAGE_SIZE]
+    if not tasks and page == 0:
+        if task_filter == "all":
+            return "У тебя пока нет задач. Используй /add чтобы создать первую!", None
+        return f"<b>{LIST_FILTERS[task_filter]}:</b> задач нет.", build_tasks_keyboard(task_filter, 0, False)
+
+    first_number += page * LIST_PAGE_SIZE
+    msg = "<b>Твои задачи:</b>\n" if task_filter == "all" else f"<b>Твои задачи — {LIST_FILTERS[task_filter].lower()}:</b>\n"
+    for i, task in enumerate(tasks, first_number):
+        status = "✅" if task.is_done else "🟡"
+        deadline = task.deadline.strftime("%Y-%m-%d")
+        description = task.description
+        if len(description) > LIST_DESCRIPTION_LIMIT:
+            description = description[:LIST_DESCRIPTION_LIMIT] + "…"
+        msg += f"{i}. <b>{html.escape(description)}</b> (до {deadline}) {status}\n"
+    if page > 0 or has_next:
+        msg += f"\nСтраница {page + 1}"
+    return msg, build_tasks_keyboard(task_filter, page, has_next)
+
+
+async def cached_task_page(user_id: int, task_filter: str, page: int, version: int | None = None):
+    """
+    Страница /list из кэша по версии списка задач. Если версия не передана,
+    читает её одним запросом по первичному ключу — это дешевле, чем заново
+    выбирать задачи и собирать текст.
+    """
+    if version is None:
+        async with AsyncSessionLocal() as session:
+            version = await get_tasks_version(session, user_id)
+    # Дата в ключе: от неё зависит фильтр «просроченные»
+    key = (user_id, version, task_filter, page, date.today())
+    page_data = list_cache.get(key)
+    if page_data is TTLCache.MISSING:
+        page_data = await render_task_page(user_id, task_filter, page)
+        list_cache.set(key, page_data)
+    return page_data
+
+
+async def refresh_task_list(message: Message, user: User, version: int, send_new: bool = True):
+    """
+    После изменения задач обновляет последнее сообщение со списком на месте.
+    Если такого нет или его уже нельзя отредактировать — отправляет новый
+    список (при send_new).
+    """
+    last = last_list_messages.get(user.id)
+    task_filter = "all" if last is TTLCache.MISSING else last[2]
+    text, markup = await cached_task_page(user.id, task_filter, 0, version)
+    if last is not TTLCache.MISSING:
+        chat_id, message_id, _ = last
+        try:
+            await message.bot.edit_message_text(
+                text, chat_id=chat_id, message_id=message_id, parse_mode="HTML", reply_markup=markup,
+            )
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return
+            forget_list_message(user.id)
+    if send_new:
+        sent = await message.answer(text, parse_mode="HTML", reply_markup=markup)
+        remember_list_message(user.id, sent.chat.id, sent.message_id, task_filter)
+
+
 class AddTaskStates(StatesGroup):
     waiting_for_text = State()
     waiting_for_deadline = State()
@@ -50,13 +242,12 @@ async def add_task_text(message: Message, state: FSMContext):
 
 
 @router.message(AddTaskStates.waiting_for_deadline, F.text)
-async def add_task_deadline(message: Message, state: FSMContext):
+async def add_task_deadline(message: Message, state: FSMContext, user: User | None):
     try:
-        input_date = message.text.strip()
-        task_deadline = datetime.strptime(input_date, "%Y-%m-%d").date()
-        if task_deadline < date.today():
-            await message.answer("Дедлайн не может быть в прошлом! Введите корректную дату (ГГГГ-ММ-ДД):")
-            return
+        task_deadline = parse_deadline(message.text)
+    except DeadlineInPastError:
+        await message.answer("Дедлайн не может быть в прошлом! Введите корректную дату (ГГГГ-ММ-ДД):")
+        return
     except ValueError:
         await message.answer("Некорректный формат даты. Введите дедлайн в формате ГГГГ-ММ-ДД:")
         return
@@ -65,15 +256,12 @@ async def add_task_deadline(message: Message, state: FSMContext):
         data = await state.get_data()
         task_text = data["task_text"]
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-            if not user:
-                await message.answer("Произошла ошибка: не найден пользователь. Попробуйте заново с /start.")
-                await state.clear()
-                return
+        if not user:
+            await message.answer("Произошла ошибка: не найден пользователь. Попробуйте заново с /start.")
+            await state.clear()
+            return
 
+        async def write(session):
             task = Task(
                 user_id=user.id,
                 description=task_text,
@@ -82,7 +270,10 @@ async def add_task_deadline(message: Message, state: FSMContext):
                 is_done=False,
             )
             session.add(task)
-            await session.commit()
+            await on_task_added(session, task)
+            return await bump_tasks_version(session, user.id)
+
+        version = await run_write(write)
 
         await message.answer(
             f"✅ Задача добавлена!\n"
@@ -91,7 +282,7 @@ async def add_task_deadline(message: Message, state: FSMContext):
             parse_mode="HTML",
         )
         await state.clear()
-        await list_tasks(message)
+        await refresh_task_list(message, user, version)
     except Exception:
         logging.exception("Failed to add task")
         await message.answer("Не удалось добавить задачу. Попробуй позже.")
@@ -132,57 +323,50 @@ async def edit_task_choose_field(message: Message, state: FSMContext):
 
 
 @router.message(EditTaskStates.waiting_for_new_value, F.text)
-async def edit_task_update_value(message: Message, state: FSMContext):
+async def edit_task_update_value(message: Message, state: FSMContext, user: User | None):
     try:
         data = await state.get_data()
         task_number = data["edit_task_number"]
         field = data["edit_field"]
         new_value = message.text.strip()
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-            if not user:
-                await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
-                await state.clear()
-                return
-
-            stmt = (
-                select(Task)
-                .where(Task.user_id == user.id)
-                .order_by(Task.is_done, Task.deadline)
-            )
-            result = await session.execute(stmt)
-            tasks = result.scalars().all()
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            await state.clear()
+            return
 
-            if not tasks or task_number < 1 or task_number > len(tasks):
-                await message.answer("Некорректный номер задачи.")
-                await state.clear()
+        if field == "текст":
+            if not new_value:
+                await message.answer("Текст задачи не может быть пустым!")
+                return
+            changes = {"description": new_value}
+        else:
+            try:
+                changes = {"deadline": parse_deadline(new_value)}
+            except DeadlineInPastError:
+                await message.answer("Дедлайн не может быть в прошлом!")
+                return
+            except ValueError:
+                await message.answer("Неверный формат даты. Введи дедлайн в формате ГГГГ-ММ-ДД:")
                 return
 
-            task = tasks[task_number - 1]
-            if field == "текст":
-                if not new_value:
-                    await message.answer("Текст задачи не может быть пустым!")
-                    return
-                task.description = new_value
-            else:
-                try:
-                    deadline = datetime.strptime(new_value, "%Y-%m-%d").date()
-                    if deadline < date.today():
-                        await message.answer("Дедлайн не может быть в прошлом!")
-                        return
-                    task.deadline = deadline
-                except ValueError:
-                    await message.answer("Неверный формат даты. Введи дедлайн в формате ГГГГ-ММ-ДД:")
-                    return
-
-            await session.commit()
+        async def write(session):
+            task = await get_task_by_number(session, user.id, task_number)
+            if task is None:
+                return None
+            for name, value in changes.items():
+                setattr(task, name, value)
+            return await bump_tasks_version(session, user.id)
+
+        version = await run_write(write)
+        if version is None:
+            await message.answer("Некорректный номер задачи.")
+            await state.clear()
+            return
 
         await message.answer("✅ Задача успешно изменена!")
         await state.clear()
-        await list_tasks(message)
+        await refresh_task_list(message, user, version)
     except Exception:
         logging.exception("Failed to update task")
         await message.answer("Не удалось изменить задачу. Попробуй позже.")
@@ -190,7 +374,7 @@ async def edit_task_update_value(message: Message, state: FSMContext):
 
 
 @router.message(Command("delete"))
-async def delete_task(message: Message):
+async def delete_task(message: Message, user: User | None):
     try:
         parts = message.text.strip().split(maxsplit=1)
         if len(parts) < 2 or not parts[1].isdigit():
@@ -198,74 +382,73 @@ async def delete_task(message: Message):
             return
         task_number = int(parts[1])
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-            if not user:
-                await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
-                return
-
-            stmt = (
-                select(Task)
-                .where(Task.user_id == user.id)
-                .order_by(Task.is_done, Task.deadline)
-            )
-            result = await session.execute(stmt)
-            tasks = result.scalars().all()
-
-            if not tasks or task_number < 1 or task_number > len(tasks):
-                await message.answer("Некорректный номер задачи. Используй /list чтобы узнать номер.")
-                return
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
 
-            task = tasks[task_number - 1]
+        async def write(session):
+            task = await get_task_by_number(session, user.id, task_number)
+            if task is None:
+                return None
+            await on_task_deleted(session, task)
             await session.delete(task)
-            await session.commit()
+            return await bump_tasks_version(session, user.id)
+
+        version = await run_write(write)
+        if version is None:
+            await message.answer("Некорректный номер задачи. Используй /list чтобы узнать номер.")
+            return
 
         await message.answer("Задача удалена.")
-        await list_tasks(message)
+        await refresh_task_list(message, user, version)
     except Exception:
         logging.exception("Failed to delete task")
         await message.answer("Не удалось удалить задачу. Попробуй позже.")
 
 
 @router.message(Command("list"))
-async def list_tasks(message: Message):
+async def list_tasks(message: Message, user: User | None, command: CommandObject | None = None):
     try:
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-            if not user:
-                await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
-                return
-
-            stmt = (
-                select(Task)
-                .where(Task.user_id == user.id)
-                .order_by(Task.is_done, Task.deadline)
-            )
-            result = await session.execute(stmt)
-            tasks = result.scalars().all()
-
-            if not tasks:
-                await message.answer("У тебя пока нет задач. Используй /add чтобы создать первую!")
-                return
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
 
-            msg = "<b>Твои задачи:</b>\n"
-            for i, task in enumerate(tasks, 1):
-                status = "✅" if task.is_done else "🟡"
-                deadline = task.deadline.strftime("%Y-%m-%d")
-                msg += f"{i}. <b>{task.description}</b> (до {deadline}) {status}\n"
+        task_filter = command.args.strip().lower() if command and command.args else "all"
+        if task_filter not in LIST_FILTERS:
+            await message.answer("Фильтры: /list open, /list done, /list overdue, /list archive")
+            return
 
-            await message.answer(msg, parse_mode="HTML")
+        text, markup = await cached_task_page(user.id, task_filter, 0)
+        sent = await message.answer(text, parse_mode="HTML", reply_markup=markup)
+        remember_list_message(user.id, sent.chat.id, sent.message_id, task_filter)
     except Exception:
         logging.exception("Failed to list tasks")
         await message.answer("Не удалось получить список задач. Попробуй позже.")
 
 
+@router.callback_query(F.data.startswith("tasks_page_"))
+async def list_tasks_page(callback: CallbackQuery, user: User | None):
+    try:
+        if not user:
+            await callback.answer("Пользователь не найден. Вызовите /start.", show_alert=True)
+            return
+        _, _, task_filter, page = callback.data.split("_")
+        text, markup = await cached_task_page(user.id, task_filter, int(page))
+        remember_list_message(user.id, callback.message.chat.id, callback.message.message_id, task_filter)
+        try:
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+        except TelegramBadRequest as e:
+            # Нажали на уже открытую страницу — текст не изменился
+            if "message is not modified" not in str(e):
+                raise
+        await callback.answer()
+    except Exception:
+        logging.exception("Failed to paginate tasks")
+        await callback.answer("Ошибка при получении страницы.", show_alert=True)
+
+
 @router.message(Command("done"))
-async def done_task(message: Message):
+async def done_task(message: Message, user: User | None):
     try:
         parts = message.text.strip().split(maxsplit=1)
         if len(parts) < 2 or not parts[1].isdigit():
@@ -273,36 +456,30 @@ async def done_task(message: Message):
             return
         task_number = int(parts[1])
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.telegram_id == message.from_user.id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-            if not user:
-                await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
-                return
-
-            stmt = (
-                select(Task)
-                .where(Task.user_id == user.id)
-                .order_by(Task.is_done, Task.deadline)
-            )
-            result = await session.execute(stmt)
-            tasks = result.scalars().all()
-
-            if not tasks or task_number < 1 or task_number > len(tasks):
-                await message.answer("Некорректный номер задачи. Используй /list чтобы узнать номер.")
-                return
-
-            task = tasks[task_number - 1]
-            if task.is_done:
-                await message.answer("Эта задача уже была отмечена как выполненная.")
-                return
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
 
+        async def write(session):
+            task = await get_task_by_number(session, user.id, task_number)
+            if task is None or task.is_done:
+                return task, None
             task.is_done = True
             task.done_at = datetime.utcnow() + timedelta(hours=3)
-            await session.commit()
+            await on_task_done(session, task)
+            return task, await bump_tasks_version(session, user.id)
+
+        task, version = await run_write(write)
+        if task is None:
+            await message.answer("Некорректный номер задачи. Используй /list чтобы узнать номер.")
+            return
+        if version is None:
+            await message.answer("Эта задача уже была отмечена как выполненная.")
+            return
 
         await message.answer(f"Задача <b>{task.description}</b> отмечена как выполненная! ✅", parse_mode="HTML")
+        # Новый список на /done не присылаем, а уже открытый обновляем
+        await refresh_task_list(message, user, version, send_new=False)
     except Exception:
         logging.exception("Failed to mark task done")
         await message.answer("Не удалось отметить задачу. Попробуй позже.")
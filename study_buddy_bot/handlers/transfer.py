@@ -0,0 +1,208 @@
+import asyncio
+import html
+import logging
+from datetime import datetime, timedelta
+from tempfile import SpooledTemporaryFile
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import StatesGroup, State
+from aiogram.types import Message
+from sqlalchemy import insert, literal, select
+from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.models import Task, TaskArchive, User
+from study_buddy_bot.config import IMPORT_MAX_FILE_SIZE, IMPORT_MAX_ROWS
+from study_buddy_bot.stats_rollup import on_tasks_imported
+from study_buddy_bot.list_cache import bump_tasks_version
+from study_buddy_bot.handlers.tasks import refresh_task_list
+from study_buddy_bot.task_files import (
+    SpooledInputFile,
+    detect_format,
+    export_footer,
+    export_header,
+    parse_tasks_file,
+    write_rows,
+)
+
+
+router = Router()
+
+# До какого размера файл держим в памяти, дальше — во временном файле на диске
+SPOOL_MAX_SIZE = 256 * 1024
+
+# Максимальная длина текста импортируемой задачи
+IMPORT_DESCRIPTION_LIMIT = 1000
+
+# Сколько строк читаем из курсора и кодируем за раз при экспорте
+EXPORT_CHUNK_SIZE = 1000
+
+# Пользователи, у которых сейчас идёт экспорт: второй параллельный не запускаем
+_exports_in_progress: set[int] = set()
+
+IMPORT_HELP = (
+    "Пришли файл с задачами:\n"
+    "• <b>CSV</b> — колонки «текст» и «дедлайн» (ГГГГ-ММ-ДД), разделитель «,» или «;»;\n"
+    "• <b>ICS</b> — задачи (VTODO) и события (VEVENT) из календаря.\n"
+    f"Не больше {IMPORT_MAX_ROWS} задач за раз. Дедлайны в прошлом пропускаются."
+)
+
+
+class ImportStates(StatesGroup):
+    waiting_for_file = State()
+
+
+async def import_document(message: Message, user: User):
+    document = message.document
+    file_format = detect_format(document.file_name, document.mime_type)
+    if file_format is None:
+        await message.answer("Поддерживаются только файлы .csv и .ics.")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.answer(f"Файл слишком большой: максимум {IMPORT_MAX_FILE_SIZE // 1024} КБ.")
+        return
+
+    # Файл скачивается потоком в буфер, который при росте уходит на диск,
+    # а разбор идёт построчно в отдельном потоке, не блокируя event loop
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        await message.bot.download(document, destination=buffer)
+        result = await asyncio.to_thread(
+            parse_tasks_file, buffer, file_format, IMPORT_MAX_ROWS, IMPORT_DESCRIPTION_LIMIT,
+        )
+
+    if result.tasks:
+        created_at = datetime.utcnow() + timedelta(hours=3)
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert(Task), [
+                {
+                    "user_id": user.id,
+                    "description": description,
+                    "deadline": deadline,
+                    "created_at": created_at,
+                    "is_done": False,
+                }
+                for description, deadline in result.tasks
+            ])
+            await on_tasks_imported(session, user.id, created_at, len(result.tasks))
+            version = await bump_tasks_version(session, user.id)
+            await session.commit()
+
+    text = f"📥 Импортировано задач: <b>{len(result.tasks)}</b>"
+    if result.truncated:
+        text += f"\nФайл обрезан: за один раз импортируется не больше {IMPORT_MAX_ROWS} задач."
+    if result.rejected_count:
+        text += f"\nПропущено строк: <b>{result.rejected_count}</b>"
+        for line_num, reason in result.rejected:
+            text += f"\n• строка {line_num}: {html.escape(reason)}"
+        if result.rejected_count > len(result.rejected):
+            text += "\n…"
+    if result.tasks:
+        text += "\n\nСписок задач: /list"
+    await message.answer(text, parse_mode="HTML")
+    if result.tasks:
+        await refresh_task_list(message, user, version, send_new=False)
+
+
+@router.message(Command("import"))
+async def import_start(message: Message, state: FSMContext, user: User | None):
+    try:
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+        # Файл можно прислать сразу с подписью /import
+        if message.document:
+            await import_document(message, user)
+            return
+        await message.answer(IMPORT_HELP, parse_mode="HTML")
+        await state.set_state(ImportStates.waiting_for_file)
+    except Exception:
+        logging.exception("Failed to handle /import")
+        await message.answer("Не удалось импортировать задачи. Попробуй позже.")
+
+
+@router.message(ImportStates.waiting_for_file, F.document)
+async def import_file(message: Message, state: FSMContext, user: User | None):
+    try:
+        await state.clear()
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+        await import_document(message, user)
+    except Exception:
+        logging.exception("Failed to import tasks")
+        await message.answer("Не удалось импортировать задачи. Попробуй позже.")
+
+
+@router.message(ImportStates.waiting_for_file)
+async def import_not_a_file(message: Message, state: FSMContext):
+    try:
+        await state.clear()
+        await message.answer("Импорт отменён. Чтобы загрузить задачи, отправь /import и затем файл.")
+    except Exception:
+        logging.exception("Failed to cancel import")
+        await message.answer("Упс, произошла ошибка. Попробуй позже.")
+
+
+async def write_export(buffer, user_id: int, file_format: str) -> int:
+    """
+    Потоково выгружает историю задач (вместе с архивом) в буфер: строки
+    читаются из серверного курсора порциями, кодирование и запись идут
+    в отдельном потоке. Возвращает число выгруженных задач.
+    """
+    current = (
+        select(Task.id, Task.description, Task.deadline, Task.is_done, Task.created_at, Task.done_at)
+        .where(Task.user_id == user_id)
+    )
+    archived = (
+        select(
+            TaskArchive.id, TaskArchive.description, TaskArchive.deadline,
+            literal(True), TaskArchive.created_at, TaskArchive.done_at,
+        )
+        .where(TaskArchive.user_id == user_id)
+    )
+    # id в архиве прежний, поэтому общий порядок — порядок создания задач
+    stmt = (
+        current.union_all(archived)
+        .order_by("id")
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    count = 0
+    await asyncio.to_thread(buffer.write, export_header(file_format))
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            await asyncio.to_thread(write_rows, buffer, file_format, rows)
+            count += len(rows)
+    await asyncio.to_thread(buffer.write, export_footer(file_format))
+    return count
+
+
+@router.message(Command("export"))
+async def export_tasks(message: Message, user: User | None, command: CommandObject):
+    try:
+        if not user:
+            await message.answer("Ошибка: пользователь не найден. Вызовите /start.")
+            return
+        file_format = (command.args or "csv").strip().lower()
+        if file_format not in ("csv", "ics"):
+            await message.answer("Формат: /export csv или /export ics")
+            return
+        if user.id in _exports_in_progress:
+            await message.answer("Экспорт уже готовится, подожди немного.")
+            return
+
+        _exports_in_progress.add(user.id)
+        try:
+            with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+                count = await write_export(buffer, user.id, file_format)
+                if not count:
+                    await message.answer("У тебя пока нет задач для экспорта.")
+                    return
+                await message.answer_document(
+                    SpooledInputFile(buffer, filename=f"tasks.{file_format}"),
+                    caption=f"📤 Задач в файле: {count}",
+                )
+        finally:
+            _exports_in_progress.discard(user.id)
+    except Exception:
+        logging.exception("Failed to export tasks")
+        await message.answer("Не удалось выгрузить задачи. Попробуй позже.")
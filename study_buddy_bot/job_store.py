@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable
+from sqlalchemy import and_, delete, or_, select, update
+from study_buddy_bot.db import AsyncSessionLocal, dialect_insert
+from study_buddy_bot.models import JobRun, SchedulerLease
+from study_buddy_bot.config import SCHEDULER_LEASE_TTL, SCHEDULER_RUN_TIMEOUT
+
+# Уникальное имя инстанса: в аренде лидера и в отметках о запусках
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Сколько дней храним отметки о запусках
+JOB_RUNS_KEEP_DAYS = 7
+
+# Как часто идущий запуск обновляет claimed_at, чтобы его не сочли зависшим
+RUN_HEARTBEAT_INTERVAL = SCHEDULER_RUN_TIMEOUT / 6
+
+# Через сколько обработанных сообщений сохраняем контрольную точку запуска.
+# После падения инстанса повторно уйдут не больше стольких сообщений
+RUN_CHECKPOINT_EVERY = 100
+
+# claimed_at освобождённого после ошибки запуска: следующий тик заберёт его сразу
+RELEASED_AT = datetime(1970, 1, 1)
+
+
+def floor_time(value: datetime, period: timedelta) -> datetime:
+    """Начало интервала длины period, в который попадает value."""
+    return datetime.min + (value - datetime.min) // period * period
+
+
+class LeaderLease:
+    """
+    Роль лидера через строку аренды в БД. Продлить может только текущий
+    держатель; чужую аренду можно забрать, когда она истекла. Лидером
+    инстанс считает себя до конца аренды по своим часам, с запасом.
+    """
+
+    def __init__(self, name: str, ttl: int):
+        self.name = name
+        self.ttl = ttl
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    async def renew(self) -> bool:
+        started = time.monotonic()
+        now = datetime.utcnow()
+        stmt = dialect_insert(SchedulerLease).values(
+            name=self.name, holder=INSTANCE_ID, expires_at=now + timedelta(seconds=self.ttl),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SchedulerLease.name],
+            set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+            where=or_(SchedulerLease.holder == INSTANCE_ID, SchedulerLease.expires_at < now),
+        ).returning(SchedulerLease.holder)
+        async with AsyncSessionLocal() as session:
+            acquired = (await session.execute(stmt)).first() is not None
+            await session.commit()
+
+        was_leader = self.is_leader
+        # Запас в треть срока покрывает задержку запроса и расхождение часов
+        self._valid_until = started + self.ttl * 2 / 3 if acquired else 0.0
+        if acquired != was_leader:
+            logging.info("[Leader] %s: %s", INSTANCE_ID, "стал лидером" if acquired else "больше не лидер")
+        return acquired
+
+    async def release(self):
+        self._valid_until = 0.0
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                delete(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == INSTANCE_ID)
+            )
+            await session.commit()
+
+
+leader = LeaderLease("main", SCHEDULER_LEASE_TTL)
+
+
+async def claim_run(job: str, bucket: datetime, partition: int = 0):
+    """
+    Забирает запуск (job, bucket, partition) за этим инстансом, если его ещё
+    никто не брал или взявший инстанс не продлевал отметку
+    SCHEDULER_RUN_TIMEOUT секунд (упал). Возвращает строку с progress
+    прерванного запуска или None, если запуск забрать не удалось.
+    """
+    now = datetime.utcnow()
+    stmt = dialect_insert(JobRun).values(
+        job=job, bucket=bucket, partition=partition, claimed_by=INSTANCE_ID, claimed_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[JobRun.job, JobRun.bucket, JobRun.partition],
+        set_={"claimed_by": stmt.excluded.claimed_by, "claimed_at": stmt.excluded.claimed_at},
+        where=and_(
+            JobRun.finished_at.is_(None),
+            JobRun.claimed_at < now - timedelta(seconds=SCHEDULER_RUN_TIMEOUT),
+        ),
+    ).returning(JobRun.progress)
+    async with AsyncSessionLocal() as session:
+        claimed = (await session.execute(stmt)).first()
+        await session.commit()
+    return claimed
+
+
+def _own_run(job: str, bucket: datetime, partition: int) -> tuple:
+    return (
+        JobRun.job == job,
+        JobRun.bucket == bucket,
+        JobRun.partition == partition,
+        JobRun.claimed_by == INSTANCE_ID,
+    )
+
+
+async def _heartbeat(job: str, bucket: datetime, partition: int):
+    """
+    Пока запуск идёт, продлевает отметку: долгая рассылка напоминаний не
+    должна выглядеть зависшей для других инстансов.
+    """
+    while True:
+        await asyncio.sleep(RUN_HEARTBEAT_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(JobRun).where(*_own_run(job, bucket, partition)).values(claimed_at=datetime.utcnow())
+                )
+                await session.commit()
+        except Exception:
+            logging.exception("[Scheduler] Не удалось продлить запуск %s за %s", job, bucket)
+
+
+class RunCheckpoint:
+    """
+    Контрольная точка запуска. Сообщения отправляются пулом воркеров не по
+    порядку, поэтому сохраняем наибольший ключ, до которого включительно
+    обработано всё, — каждые RUN_CHECKPOINT_EVERY сообщений и при ошибке.
+    Ключи источника должны возрастать (user.id в порядке запроса).
+    """
+
+    def __init__(self, job: str, bucket: datetime, partition: int, last_key: int | None):
+        self.job = job
+        self.bucket = bucket
+        self.partition = partition
+        # Продолжать с ключей больше last_key; None — с начала
+        self.last_key = last_key
+        self._pending = deque()
+        self._done = set()
+        self._unsaved = 0
+        self._lock = asyncio.Lock()
+
+    async def track(self, messages: AsyncIterator[tuple]) -> AsyncIterator[tuple]:
+        """Пропускает через себя тройки (chat_id, текст, ключ), запоминая порядок ключей."""
+        async for chat_id, text, key in messages:
+            self._pending.append(key)
+            yield chat_id, text, key
+
+    async def done(self, key: int):
+        """Отмечает сообщение с ключом key обработанным (отправлено или нет — неважно)."""
+        self._done.add(key)
+        while self._pending and self._pending[0] in self._done:
+            self.last_key = self._pending.popleft()
+            self._done.discard(self.last_key)
+        self._unsaved += 1
+        if self._unsaved >= RUN_CHECKPOINT_EVERY:
+            await self.save()
+
+    async def save(self):
+        self._unsaved = 0
+        async with self._lock:
+            # last_key читаем под блокировкой: точки пишутся по возрастанию
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(JobRun)
+                    .where(*_own_run(self.job, self.bucket, self.partition))
+                    .values(progress=self.last_key)
+                )
+                await session.commit()
+
+
+async def _finish_run(job: str, bucket: datetime, partition: int):
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(JobRun).where(*_own_run(job, bucket, partition)).values(finished_at=datetime.utcnow())
+        )
+        await session.commit()
+
+
+async def _release_run(job: str, bucket: datetime, partition: int, checkpoint: RunCheckpoint | None):
+    """
+    Освобождает запуск после ошибки, сохраняя контрольную точку: следующий
+    тик продолжит с неё, а не начнёт интервал заново.
+    """
+    values = {"claimed_at": RELEASED_AT}
+    if checkpoint is not None:
+        values["progress"] = checkpoint.last_key
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(JobRun).where(*_own_run(job, bucket, partition)).values(**values))
+        await session.commit()
+
+
+async def run_once(
+    job: str,
+    bucket: datetime,
+    func: Callable[..., Awaitable],
+    partition: int = 0,
+    checkpoint: bool = False,
+) -> bool:
+    """
+    Выполняет func, если этот инстанс первым забрал запуск. Возвращает
+    True, если запуск выполнен здесь. При ошибке запуск освобождается.
+    Пока func работает, отметка продлевается каждые RUN_HEARTBEAT_INTERVAL секунд.
+
+    С checkpoint=True func получает аргумент checkpoint (RunCheckpoint) и
+    должна продолжать с checkpoint.last_key: после ошибки или падения
+    инстанса запуск продолжится с сохранённой точки.
+    """
+    claimed = await claim_run(job, bucket, partition)
+    if claimed is None:
+        return False
+    progress = RunCheckpoint(job, bucket, partition, claimed.progress) if checkpoint else None
+    heartbeat = asyncio.create_task(_heartbeat(job, bucket, partition))
+    try:
+        if progress is not None:
+            await func(checkpoint=progress)
+        else:
+            await func()
+    except Exception:
+        await _release_run(job, bucket, partition, progress)
+        raise
+    finally:
+        heartbeat.cancel()
+    await _finish_run(job, bucket, partition)
+    return True
+
+
+async def claimed_runs(job: str, since: datetime) -> set[tuple[datetime, int]]:
+    """
+    (bucket, partition) запусков job начиная с since, которые уже выполнены
+    или выполняются сейчас. Зависшие запуски сюда не входят.
+    """
+    stale = datetime.utcnow() - timedelta(seconds=SCHEDULER_RUN_TIMEOUT)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(JobRun.bucket, JobRun.partition)
+            .where(
+                JobRun.job == job,
+                JobRun.bucket >= since,
+                or_(JobRun.finished_at.is_not(None), JobRun.claimed_at >= stale),
+            )
+        )
+        return {(bucket, partition) for bucket, partition in result}
+
+
+async def prune_job_runs(keep_days: int = JOB_RUNS_KEEP_DAYS):
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            delete(JobRun).where(JobRun.bucket < datetime.utcnow() - timedelta(days=keep_days))
+        )
+        await session.commit()
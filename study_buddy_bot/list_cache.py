@@ -0,0 +1,37 @@
+from sqlalchemy import select, update
+from study_buddy_bot.models import User
+from study_buddy_bot.config import LIST_CACHE_SIZE, LIST_CACHE_TTL, LIST_MESSAGE_TTL
+from study_buddy_bot.utils import TTLCache
+
+# (user_id, версия списка, фильтр, страница, дата) → (текст, клавиатура)
+list_cache = TTLCache(LIST_CACHE_SIZE, LIST_CACHE_TTL)
+
+# user_id → (chat_id, message_id, фильтр) последнего отправленного /list
+last_list_messages = TTLCache(LIST_CACHE_SIZE, LIST_MESSAGE_TTL)
+
+
+async def bump_tasks_version(session, user_id: int) -> int:
+    """
+    Увеличивает версию списка задач пользователя в транзакции изменения
+    и возвращает новую. Закэшированные страницы старой версии больше не читаются.
+    """
+    result = await session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(tasks_version=User.tasks_version + 1)
+        .returning(User.tasks_version)
+    )
+    return result.scalar_one()
+
+
+async def get_tasks_version(session, user_id: int) -> int:
+    result = await session.execute(select(User.tasks_version).where(User.id == user_id))
+    return result.scalar_one()
+
+
+def remember_list_message(user_id: int, chat_id: int, message_id: int, task_filter: str):
+    last_list_messages.set(user_id, (chat_id, message_id, task_filter))
+
+
+def forget_list_message(user_id: int):
+    last_list_messages.invalidate(user_id)
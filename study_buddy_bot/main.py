@@ -2,9 +2,27 @@ import asyncio
 import logging
 import sys
 from aiogram import Bot, Dispatcher
-from study_buddy_bot.config import BOT_TOKEN
-from study_buddy_bot.handlers import admin, common, stats, tasks
-from study_buddy_bot.scheduler import start_scheduler
+from study_buddy_bot.config import (
+    BOT_TOKEN,
+    BOT_MODE,
+    UPDATES_CONCURRENCY,
+    FSM_STORAGE,
+    METRICS_HOST,
+    METRICS_PORT,
+)
+from study_buddy_bot.handlers import admin, common, settings, stats, tasks, transfer
+from study_buddy_bot.scheduler import scheduler, start_scheduler
+from study_buddy_bot.fsm_storage import SQLStorage
+from study_buddy_bot.db import engine, log_pool_stats
+from study_buddy_bot.metrics import ErrorCountingHandler, instrument_engine, start_metrics_server
+from study_buddy_bot.broadcasts import broadcast_worker
+from study_buddy_bot.job_store import leader
+from study_buddy_bot.write_coalescer import write_coalescer
+from study_buddy_bot.middlewares.user import UserMiddleware
+from study_buddy_bot.middlewares.concurrency import ConcurrencyLimitMiddleware
+from study_buddy_bot.middlewares.metrics import HandlerNameMiddleware, MetricsMiddleware
+from study_buddy_bot.middlewares.throttling import ThrottlingMiddleware
+from study_buddy_bot.webhook import run_webhook
 from aiogram.client.default import DefaultBotProperties
 
 # 1. Настроим логирование
@@ -14,10 +32,37 @@ logging.basicConfig(
     stream=sys.stdout,
 )
 
+def create_dispatcher(storage=None, concurrency_limit: int | None = None) -> Dispatcher:
+    """
+    Диспетчер с нашими middleware. Встроенный FSM-middleware регистрируем
+    сами (disable_fsm=True): с SQL-хранилищем он читает состояние из БД,
+    поэтому ограничение одновременных апдейтов и частоты должно стоять перед ним.
+    Порядок внешних middleware на dp.update:
+    Errors и UserContext (встроенные, дают event_from_user) → ограничение
+    одновременных апдейтов → ограничение частоты → метрики → FSM → UserMiddleware.
+    Метрики стоят после ограничений: bot_handler_duration_seconds — время
+    обработки апдейта без ожидания в очереди, но с запросами FSM и UserMiddleware.
+    """
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+    if concurrency_limit:
+        dp.update.outer_middleware(ConcurrencyLimitMiddleware(concurrency_limit))
+    # Отброшенные апдейты не доходят ни до FSM, ни до UserMiddleware — без запросов к БД
+    dp.update.outer_middleware(ThrottlingMiddleware())
+    dp.update.outer_middleware(MetricsMiddleware())
+    dp.update.outer_middleware(dp.fsm)
+    register_handlers(dp)
+    return dp
+
 def register_handlers(dp: Dispatcher):
+    dp.update.outer_middleware(UserMiddleware())
+    # Внутренние middleware диспетчера действуют на хендлеры всех роутеров
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
     dp.include_router(common.router)
     dp.include_router(tasks.router)
     dp.include_router(stats.router)
+    dp.include_router(settings.router)
+    dp.include_router(transfer.router)
     dp.include_router(admin.router)
 
 async def main():
@@ -26,16 +71,47 @@ async def main():
         token=BOT_TOKEN,
         default=DefaultBotProperties(parse_mode="HTML")
     )
-    dp = Dispatcher()
-
-    # 3. Регистрируем роутеры
-    register_handlers(dp)
+    # Общее FSM-хранилище в БД, чтобы диалоги /add и /edit переживали
+    # перезапуск и работали при нескольких инстансах
+    storage = SQLStorage() if FSM_STORAGE == "sql" else None
+    # 3. Регистрируем middleware и роутеры. Ограничение одновременных
+    # апдейтов нужно только в webhook; в polling его задаёт start_polling
+    dp = create_dispatcher(
+        storage,
+        concurrency_limit=UPDATES_CONCURRENCY if BOT_MODE == "webhook" else None,
+    )
 
     # 4. Запускаем планировщик (ежедневные напоминания и т.д.)
     start_scheduler(bot)
+    scheduler.add_job(log_pool_stats, "interval", minutes=5)
+    if storage is not None:
+        scheduler.add_job(storage.delete_expired, "interval", hours=1)
+
+    # Метрики: время хендлеров и запросов к БД, ошибки, состояние пула
+    metrics_runner = None
+    if METRICS_PORT:
+        instrument_engine(engine)
+        logging.getLogger().addHandler(ErrorCountingHandler())
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
 
-    # 5. Запускаем polling (бесконечный цикл обработки сообщений)
-    await dp.start_polling(bot)
+    # 5. Запускаем воркер рассылок (продолжит незавершённые после перезапуска).
+    # Рассылки выполняет только лидер среди инстансов
+    await leader.renew()
+    broadcast_task = asyncio.create_task(broadcast_worker(bot))
+
+    # 6. Запускаем webhook-сервер или polling (бесконечный цикл обработки сообщений)
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await dp.start_polling(bot, tasks_concurrency_limit=UPDATES_CONCURRENCY)
+    finally:
+        broadcast_task.cancel()
+        await leader.release()
+        if write_coalescer is not None:
+            await write_coalescer.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == "__main__":
     try:
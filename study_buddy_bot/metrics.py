@@ -0,0 +1,178 @@
+import logging
+import time
+from contextvars import ContextVar
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from study_buddy_bot.db import pool_stats
+
+# Границы корзин гистограмм (секунды и штуки)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Имя хендлера и счётчик запросов к БД для текущего апдейта
+current_handler: ContextVar[str | None] = ContextVar("current_handler", default=None)
+update_queries: ContextVar[list[int] | None] = ContextVar("update_queries", default=None)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels → (счётчики по корзинам, сумма, количество)
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        item = self._values.get(labels)
+        if item is None:
+            item = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                item[0][i] += 1
+        item[1] += value
+        item[2] += 1
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = format_labels(self.labelnames + ("le",), labels + (bound,))
+                yield f"{self.name}_bucket{le} {bucket_count}"
+            le = format_labels(self.labelnames + ("le",), labels + ("+Inf",))
+            yield f"{self.name}_bucket{le} {count}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {count}"
+
+
+def format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+handler_latency = Histogram(
+    "bot_handler_duration_seconds", "Время работы хендлера", ("handler",)
+)
+handler_errors = Counter(
+    "bot_handler_errors_total", "Ошибки в хендлерах (исключения и logging.exception)", ("handler",)
+)
+handler_queries = Histogram(
+    "bot_handler_db_queries", "Число запросов к БД за вызов хендлера", ("handler",), QUERY_COUNT_BUCKETS
+)
+query_latency = Histogram(
+    "bot_db_query_duration_seconds", "Время выполнения запроса к БД", ("operation",)
+)
+throttled_updates = Counter(
+    "bot_throttled_updates_total", "Апдейты, отброшенные ограничением частоты", ("reason",)
+)
+
+REGISTRY = (handler_latency, handler_errors, handler_queries, query_latency, throttled_updates)
+
+
+def collect_pool():
+    stats = pool_stats()
+    gauges = (
+        ("bot_db_pool_size", "Размер пула соединений", stats["size"]),
+        ("bot_db_pool_checked_out", "Выданные соединения", stats["checked_out"]),
+        ("bot_db_pool_overflow", "Соединения сверх размера пула", stats["overflow"]),
+        ("bot_db_pool_wait_avg_ms", "Среднее ожидание соединения, мс", stats["wait_avg_ms"]),
+    )
+    for name, documentation, value in gauges:
+        yield f"# HELP {name} {documentation}"
+        yield f"# TYPE {name} gauge"
+        yield f"{name} {value}"
+    for name, documentation, value in (
+        ("bot_db_pool_checkouts_total", "Выдачи соединений из пула", stats["checkouts"]),
+        ("bot_db_pool_timeouts_total", "Таймауты ожидания соединения", stats["timeouts"]),
+    ):
+        yield f"# HELP {name} {documentation}"
+        yield f"# TYPE {name} counter"
+        yield f"{name} {value}"
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    lines.extend(collect_pool())
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = context.query_started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    query_latency.observe(time.perf_counter() - started, operation)
+    counter = update_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подключает замер времени и подсчёт запросов к движку."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ErrorCountingHandler(logging.Handler):
+    """
+    Хендлеры бота сами ловят исключения и пишут logging.exception,
+    поэтому ошибки считаем по записям уровня ERROR внутри апдейта.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record: logging.LogRecord):
+        name = current_handler.get()
+        if name is not None:
+            handler_errors.inc(name)
+
+
+async def metrics_view(request: web.Request) -> web.Response:
+    return web.Response(
+        text=render_metrics(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Поднимает локальный HTTP-сервер с /metrics в формате Prometheus."""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_view)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info("[Metrics] Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
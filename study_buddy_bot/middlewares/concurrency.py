@@ -0,0 +1,23 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничивает число одновременно обрабатываемых апдейтов. Нужен в режиме
+    webhook: aiohttp-обработчик запускает каждый апдейт отдельной задачей.
+    """
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
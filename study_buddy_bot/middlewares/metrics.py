@@ -0,0 +1,65 @@
+import time
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from study_buddy_bot.metrics import (
+    current_handler,
+    update_queries,
+    handler_latency,
+    handler_errors,
+    handler_queries,
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на dp.update: пишет время обработки апдейта, ошибки
+    и число запросов к БД, включая запросы FSM-хранилища и UserMiddleware.
+    Ожидание в очереди ConcurrencyLimitMiddleware сюда не входит — он стоит
+    раньше (см. main.create_dispatcher); отброшенные ThrottlingMiddleware
+    апдейты тоже, их считает bot_throttled_updates_total.
+    Метка — имя хендлера, которое проставляет HandlerNameMiddleware; если
+    хендлер не нашёлся, метка — тип апдейта (message, edited_message, ...).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        name = event.event_type if isinstance(event, Update) else type(event).__name__
+        handler_token = current_handler.set(name)
+        queries = [0]
+        queries_token = update_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(current_handler.get())
+            raise
+        finally:
+            # Хендлер вызывается в той же задаче, поэтому имя, выставленное
+            # внутренним middleware, здесь уже видно
+            name = current_handler.get()
+            handler_latency.observe(time.perf_counter() - started, name)
+            handler_queries.observe(queries[0], name)
+            update_queries.reset(queries_token)
+            current_handler.reset(handler_token)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: знает, какой хендлер выбран, и передаёт его имя
+    в метрики. Сбрасывать не нужно — это сделает MetricsMiddleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        current_handler.set(data["handler"].callback.__name__)
+        return await handler(event, data)
+
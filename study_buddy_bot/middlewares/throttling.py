@@ -0,0 +1,133 @@
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from study_buddy_bot.config import (
+    THROTTLE_RATE,
+    THROTTLE_BURST,
+    THROTTLE_COSTS,
+    THROTTLE_DUPLICATE_WINDOW,
+    THROTTLE_CACHE_SIZE,
+)
+from study_buddy_bot.metrics import throttled_updates
+from study_buddy_bot.utils import TTLCache
+
+
+class UserBucket:
+    """Токены пользователя и его последний запрос (для отбрасывания повторов)."""
+
+    __slots__ = ("tokens", "updated", "last_key", "last_at", "warned")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.last_key = None
+        self.last_at = 0.0
+        self.warned = False
+
+
+def request_key(update: Update) -> tuple[str | None, str | None]:
+    """
+    Возвращает (команда, ключ повтора). Ключ есть только у команд и нажатий
+    кнопок — повтор текста в диалоге /add или /edit может быть осознанным.
+    """
+    if update.message:
+        text = update.message.text or update.message.caption or ""
+        if not text.startswith("/"):
+            return None, None
+        command = text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+        # Файл с подписью /import — не повтор, даже если подпись та же
+        if update.message.document:
+            return command, None
+        return command, text.strip()
+    if update.callback_query:
+        return None, f"callback:{update.callback_query.data}"
+    return None, None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничивает частоту запросов каждого пользователя токен-бакетом:
+    `rate` токенов в секунду, запас до `burst`. Команда стоит costs[команда]
+    токенов (по умолчанию 1), поэтому тяжёлые /stats и /list кончаются
+    быстрее. Та же команда или кнопка в течение duplicate_window секунд
+    отбрасывается без обработки.
+
+    Стоит до FSM-middleware и UserMiddleware (см. main.create_dispatcher),
+    поэтому отброшенный апдейт не делает ни одного запроса к БД.
+    Бакеты живут в TTLCache: запись удаляется, когда пользователь молчит
+    дольше, чем нужно на полное пополнение, — то есть когда она уже
+    ничем не отличается от новой.
+    """
+
+    def __init__(
+        self,
+        rate: float = THROTTLE_RATE,
+        burst: float = THROTTLE_BURST,
+        costs: dict[str, float] | None = None,
+        duplicate_window: float = THROTTLE_DUPLICATE_WINDOW,
+        maxsize: int = THROTTLE_CACHE_SIZE,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.costs = THROTTLE_COSTS if costs is None else costs
+        self.duplicate_window = duplicate_window
+        idle = max(burst / rate if rate > 0 else 0, duplicate_window)
+        self._buckets = TTLCache(maxsize, idle)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        if self.rate <= 0 or from_user is None or not isinstance(event, Update):
+            return await handler(event, data)
+
+        now = time.monotonic()
+        command, key = request_key(event)
+        bucket = self._buckets.get(from_user.id)
+        if bucket is TTLCache.MISSING:
+            bucket = UserBucket(self.burst, now)
+        self._buckets.set(from_user.id, bucket)
+
+        if key is not None and key == bucket.last_key and now - bucket.last_at < self.duplicate_window:
+            bucket.last_at = now
+            throttled_updates.inc("duplicate")
+            await self._reject(event, None)
+            return None
+
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        # Дороже запаса команда не бывает, иначе её нельзя было бы выполнить никогда
+        cost = min(self.costs.get(command, 1.0), self.burst)
+        if bucket.tokens < cost:
+            throttled_updates.inc("rate")
+            wait = (cost - bucket.tokens) / self.rate
+            await self._reject(event, None if bucket.warned else wait)
+            bucket.warned = True
+            return None
+
+        bucket.tokens -= cost
+        bucket.warned = False
+        bucket.last_key, bucket.last_at = key, now
+        return await handler(event, data)
+
+    @staticmethod
+    async def _reject(update: Update, wait: float | None):
+        """
+        Отвечает на отброшенный апдейт. Предупреждение о лимите — один раз,
+        пока пользователь не дождётся; на кнопку отвечаем всегда, иначе
+        у неё бесконечно крутится индикатор загрузки.
+        """
+        text = f"Слишком много запросов. Подожди {max(1, math.ceil(wait))} сек." if wait is not None else None
+        try:
+            if update.callback_query:
+                await update.callback_query.answer(text)
+            elif update.message and text:
+                await update.message.answer(text)
+        except Exception:
+            logging.exception("Failed to answer throttled update")
@@ -0,0 +1,58 @@
+import logging
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from study_buddy_bot.models import User
+from study_buddy_bot.db import AsyncSessionLocal
+from study_buddy_bot.config import USER_CACHE_SIZE, USER_CACHE_TTL
+from study_buddy_bot.utils import TTLCache
+from study_buddy_bot.counters import mark_active
+from sqlalchemy import select
+
+# telegram_id → User. Промахи (пользователь ещё не вызвал /start) не кэшируем:
+# регистрация на другом инстансе не сбросит здешний кэш, и пользователь
+# до конца TTL получал бы «вызовите /start»
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+async def resolve_user(telegram_id: int) -> User | None:
+    user = user_cache.get(telegram_id)
+    if user is not TTLCache.MISSING:
+        return user
+    async with AsyncSessionLocal() as session:
+        stmt = select(User).where(User.telegram_id == telegram_id)
+        result = await session.execute(stmt)
+        user = result.scalar_one_or_none()
+    if user is not None:
+        user_cache.set(telegram_id, user)
+    return user
+
+
+def invalidate_user(telegram_id: int):
+    """Сбрасывает кэш после изменения пользователя (например, регистрации в /start)."""
+    user_cache.invalidate(telegram_id)
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Один раз на апдейт находит пользователя по telegram_id и передаёт его
+    в хендлер аргументом `user`. Объект отсоединён от сессии — в хендлерах
+    используем его поля (id, first_name), а изменения делаем своими запросами.
+    Заодно раз в день отмечает пользователя активным (DAU/WAU).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        user = await resolve_user(from_user.id) if from_user else None
+        if user is not None:
+            try:
+                await mark_active(user)
+            except Exception:
+                logging.exception("Failed to mark user active")
+        data["user"] = user
+        return await handler(event, data)
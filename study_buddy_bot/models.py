@@ -1,5 +1,6 @@
 from typing import Optional
 from datetime import datetime, date
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 class User(SQLModel, table=True):
@@ -12,6 +13,16 @@ class User(SQLModel, table=True):
     username: Optional[str] = Field(default=None)
     is_admin: bool = Field(default=False)
     registered_at: datetime = Field(default_factory=datetime.utcnow)
+    # Часовой пояс (IANA) и локальное время напоминания в минутах от полуночи
+    timezone: str = Field(default="Europe/Moscow")
+    # /start задаёт его через scheduler.default_reminder_minute (19:00–19:59)
+    reminder_minute: int = Field(default=19 * 60)
+    # Минута суток по UTC, в которую отправляется напоминание; None — выключены
+    reminder_slot: Optional[int] = Field(default=16 * 60, index=True)
+    # День последней активности (МСК) — для DAU/WAU в /adminstats
+    last_active_day: Optional[date] = Field(default=None, index=True)
+    # Версия списка задач: растёт при каждом изменении, ключ кэша /list
+    tasks_version: int = Field(default=0)
 
     # Связь: один пользователь — много задач
     tasks: list["Task"] = Relationship(back_populates="user")
@@ -20,6 +31,18 @@ class Task(SQLModel, table=True):
     """
     Модель учебной задачи.
     """
+    __table_args__ = (
+        # Покрывает список задач пользователя и поиск задачи по номеру в /list
+        Index("ix_task_user_done_deadline", "user_id", "is_done", "deadline", "id"),
+        # Напоминания: задачи с дедлайном в ближайшие дни
+        Index("ix_task_deadline_done", "deadline", "is_done"),
+        # Диапазоны created_at / done_at для статистики и пересборки сводок
+        Index("ix_task_user_created_at", "user_id", "created_at"),
+        Index("ix_task_user_done_at", "user_id", "done_at"),
+        # Архиватор: выполненные задачи старше порога
+        Index("ix_task_done_done_at", "is_done", "done_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     description: str
@@ -30,3 +53,111 @@ class Task(SQLModel, table=True):
 
     # Связь: задача принадлежит пользователю
     user: Optional[User] = Relationship(back_populates="tasks")
+
+class TaskArchive(SQLModel, table=True):
+    """
+    Выполненная задача, перенесённая архиватором из Task. id сохраняется
+    прежним, поэтому история в экспорте идёт в исходном порядке.
+    """
+    __table_args__ = (
+        Index("ix_taskarchive_user_done_at", "user_id", "done_at"),
+    )
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    user_id: int = Field(foreign_key="user.id")
+    description: str
+    deadline: date
+    created_at: datetime
+    done_at: Optional[datetime] = None
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+class BroadcastJob(SQLModel, table=True):
+    """
+    Рассылка администратора. Прогресс хранится в БД, поэтому
+    после перезапуска бота рассылка продолжается с места остановки.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    admin_chat_id: int
+    text: str
+    status: str = Field(default="pending", index=True)  # pending / running / done
+    total: int = Field(default=0)
+    sent: int = Field(default=0)
+    failed: int = Field(default=0)
+    blocked: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BroadcastRecipient(SQLModel, table=True):
+    """
+    Получатель рассылки и статус доставки ему.
+    """
+    __table_args__ = (
+        Index("ix_broadcastrecipient_job_status", "job_id", "status", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="broadcastjob.id")
+    telegram_id: int
+    status: str = Field(default="pending")  # pending / delivered / failed / blocked
+
+class UserDailyStats(SQLModel, table=True):
+    """
+    Дневная сводка по задачам пользователя. Обновляется в той же транзакции,
+    что и сами задачи, поэтому статистика и тренды читают O(дней) строк.
+    """
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    added: int = Field(default=0)   # создано задач в этот день
+    done: int = Field(default=0)    # выполнено задач в этот день
+    closed: int = Field(default=0)  # из созданных в этот день — сколько уже выполнено
+
+class FSMRecord(SQLModel, table=True):
+    """
+    Состояние и данные FSM-диалога (общие для всех инстансов бота).
+    """
+    key: str = Field(primary_key=True)
+    state: Optional[str] = None
+    data: str = Field(default="{}")  # JSON
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class BotCounter(SQLModel, table=True):
+    """
+    Накопленный итог по боту (пользователи, задачи, напоминания).
+    Обновляется в тех же транзакциях, что и сами события.
+    """
+    name: str = Field(primary_key=True)
+    value: int = Field(default=0)
+
+class DailyCounter(SQLModel, table=True):
+    """
+    Счётчик события по дням (МСК) для /adminstats.
+    """
+    day: date = Field(primary_key=True)
+    name: str = Field(primary_key=True)
+    value: int = Field(default=0)
+
+class SchedulerLease(SQLModel, table=True):
+    """
+    Аренда роли лидера среди инстансов бота: лидером считается holder,
+    пока не истёк expires_at (UTC). Лидер продлевает аренду сам.
+    """
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
+
+class JobRun(SQLModel, table=True):
+    """
+    Запуск периодической задачи за интервал `bucket` (UTC) по части
+    пользователей `partition`. Строку вставляет тот инстанс, который
+    взялся за запуск, поэтому каждый интервал выполняется ровно один раз.
+    """
+    job: str = Field(primary_key=True)
+    bucket: datetime = Field(primary_key=True)
+    partition: int = Field(default=0, primary_key=True)
+    claimed_by: str
+    claimed_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    # Контрольная точка: до какого ключа (user.id) включительно всё уже
+    # обработано — прерванный запуск продолжается отсюда, а не с начала
+    progress: Optional[int] = None
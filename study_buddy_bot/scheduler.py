@@ -1,56 +1,276 @@
 import logging
+import random
+from functools import partial
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
 from aiogram import Bot
 from study_buddy_bot.models import User, Task
 from study_buddy_bot.db import AsyncSessionLocal
-from sqlalchemy import select
+from study_buddy_bot.sender import OutboundSender
+from study_buddy_bot.config import (
+    REMINDER_BUCKET_MINUTES,
+    SCHEDULER_PARTITIONS,
+    SCHEDULER_CATCHUP_MINUTES,
+    SCHEDULER_LEASE_TTL,
+)
+from study_buddy_bot.counters import record_counters
+from study_buddy_bot.archive import archive_done_tasks
+from study_buddy_bot.job_store import RunCheckpoint, claimed_runs, floor_time, leader, prune_job_runs, run_once
+from study_buddy_bot.utils import msk_today
+from sqlalchemy import select, update
 
 scheduler = AsyncIOScheduler()
 
-async def notify_tomorrows_tasks(bot: Bot):
+# Сколько строк забираем из курсора за один раз
+REMINDER_CHUNK_SIZE = 1000
+
+MINUTES_PER_DAY = 24 * 60
+
+# Время напоминаний по умолчанию: 19:00–19:59 по Москве. Минута внутри
+# часа зависит от telegram_id, чтобы не настроившие /remind пользователи
+# не попадали все в один интервал планировщика
+DEFAULT_REMINDER_MINUTE = 19 * 60
+DEFAULT_REMINDER_SPREAD = 60
+
+
+def build_reminder_text(descriptions: list[str]) -> str:
+    msg = "<b>Твои задачи на завтра:</b>\n"
+    for description in descriptions:
+        msg += f"• {description}\n"
+    return msg
+
+
+def utc_offset_minutes(timezone: str, now: datetime | None = None) -> int:
+    now = now or datetime.utcnow()
+    offset = now.replace(tzinfo=dt_timezone.utc).astimezone(ZoneInfo(timezone)).utcoffset()
+    return int(offset.total_seconds() // 60)
+
+
+def reminder_slot(timezone: str, local_minute: int, now: datetime | None = None) -> int:
+    """
+    Переводит локальное время напоминания (минуты от полуночи) в минуту суток по UTC.
     """
-    Рассылает всем пользователям их задачи на завтра.
+    return (local_minute - utc_offset_minutes(timezone, now)) % MINUTES_PER_DAY
+
+
+def default_reminder_minute(telegram_id: int) -> int:
+    """Локальное время напоминания нового пользователя, пока он не выбрал своё."""
+    return DEFAULT_REMINDER_MINUTE + telegram_id % DEFAULT_REMINDER_SPREAD
+
+
+async def iter_tomorrows_reminders(
+    session,
+    now: datetime,
+    slot_start: int = 0,
+    slot_end: int = MINUTES_PER_DAY,
+    partition: tuple[int, int] | None = None,
+    after_user_id: int | None = None,
+):
     """
-    tomorrow = (datetime.utcnow() + timedelta(days=1)).date()
+    Одним запросом получает невыполненные задачи пользователей, чьё время
+    напоминания (по UTC) попадает в [slot_start, slot_end), и отдаёт тройки
+    (telegram_id, текст напоминания, user.id) по мере чтения строк из курсора.
+    Строки отсортированы по user.id, поэтому в памяти держим только
+    задачи текущего пользователя, а прерванную рассылку можно продолжить
+    с after_user_id.
+
+    «Завтра» у каждого пользователя своё: локальная дата отличается от UTC
+    не больше чем на сутки, поэтому выбираем дедлайны из трёх дней
+    и оставляем только совпавшие с локальным завтра.
+
+    partition = (k, n) оставляет только пользователей с user.id % n == k.
+    """
+    utc_today = now.date()
+    stmt = (
+        select(User.id, User.telegram_id, User.timezone, Task.deadline, Task.description)
+        .join(Task, Task.user_id == User.id)
+        .where(
+            User.reminder_slot >= slot_start,
+            User.reminder_slot < slot_end,
+            Task.deadline >= utc_today,
+            Task.deadline <= utc_today + timedelta(days=2),
+            Task.is_done == False
+        )
+        .order_by(User.id, Task.id)
+        .execution_options(yield_per=REMINDER_CHUNK_SIZE)
+    )
+    if after_user_id is not None:
+        stmt = stmt.where(User.id > after_user_id)
+    if partition is not None:
+        index, count = partition
+        stmt = stmt.where(User.id % count == index)
+    result = await session.stream(stmt)
+
+    tomorrow_by_tz = {}
+    current_id = current_chat = None
+    descriptions = []
+    async for rows in result.partitions():
+        for user_id, telegram_id, timezone, deadline, description in rows:
+            if user_id != current_id:
+                if descriptions:
+                    yield current_chat, build_reminder_text(descriptions), current_id
+                current_id, current_chat = user_id, telegram_id
+                descriptions = []
+            if timezone not in tomorrow_by_tz:
+                local_now = now + timedelta(minutes=utc_offset_minutes(timezone, now))
+                tomorrow_by_tz[timezone] = local_now.date() + timedelta(days=1)
+            if deadline == tomorrow_by_tz[timezone]:
+                descriptions.append(description)
+    if descriptions:
+        yield current_chat, build_reminder_text(descriptions), current_id
+
+
+async def notify_tomorrows_tasks(
+    bot: Bot,
+    slot_start: int = 0,
+    slot_end: int = MINUTES_PER_DAY,
+    partition: tuple[int, int] | None = None,
+    now: datetime | None = None,
+    checkpoint: RunCheckpoint | None = None,
+):
+    """
+    Рассылает пользователям их задачи на завтра. По умолчанию — всем,
+    с указанным интервалом — только тем, чьё время напоминания в него попало.
+    С checkpoint продолжает после checkpoint.last_key и отмечает в нём
+    обработанных пользователей.
+    """
+    now = now or datetime.utcnow()
     async with AsyncSessionLocal() as session:
-        # Получаем всех пользователей
-        users_stmt = select(User)
-        users_result = await session.execute(users_stmt)
-        users = users_result.scalars().all()
-
-        for user in users:
-            # Получаем задачи пользователя с дедлайном на завтра и статусом "не выполнено"
-            tasks_stmt = (
-                select(Task)
-                .where(
-                    Task.user_id == user.id,
-                    Task.deadline == tomorrow,
-                    Task.is_done == False
+        messages = iter_tomorrows_reminders(
+            session, now, slot_start, slot_end, partition,
+            after_user_id=checkpoint.last_key if checkpoint else None,
+        )
+        report = await OutboundSender(bot).deliver(
+            checkpoint.track(messages) if checkpoint else messages,
+            on_sent=checkpoint.done if checkpoint else None,
+            parse_mode="HTML",
+        )
+    part = f", часть {partition[0] + 1}/{partition[1]}" if partition else ""
+    logging.info(
+        "[Scheduler] Напоминания [%s, %s)%s: доставлено %s, заблокировали бота %s, ошибок %s (%.1f сообщ./сек)",
+        slot_start, slot_end, part, report.delivered, report.blocked, report.failed, report.rate,
+    )
+    try:
+        await record_counters(
+            msk_today(),
+            reminders_delivered=report.delivered,
+            reminders_blocked=report.blocked,
+            reminders_failed=report.failed,
+        )
+    except Exception:
+        logging.exception("[Scheduler] Не удалось обновить счётчики напоминаний")
+
+
+async def notify_reminder_bucket(bot: Bot):
+    """
+    Обрабатывает интервалы в REMINDER_BUCKET_MINUTES минут, так что
+    нагрузка на БД и Telegram распределяется по суткам, а не приходится на одну минуту.
+
+    Запускается на каждом инстансе. Интервал делится на SCHEDULER_PARTITIONS
+    частей по user.id, и каждую часть выполняет ровно один инстанс — тот,
+    кто первым отметил её в JobRun. Интервалы за последние
+    SCHEDULER_CATCHUP_MINUTES минут, которые никто не выполнил (все
+    инстансы перезапускались), догоняются здесь же. Прерванная ошибкой или
+    падением инстанса часть продолжается с контрольной точки, поэтому уже
+    получившие напоминание пользователи его не получат повторно.
+    """
+    now = datetime.utcnow()
+    step = timedelta(minutes=REMINDER_BUCKET_MINUTES)
+    current = floor_time(now, step)
+    since = current - SCHEDULER_CATCHUP_MINUTES // REMINDER_BUCKET_MINUTES * step
+    done = await claimed_runs("reminders", since)
+
+    bucket = since
+    while bucket <= current:
+        # Каждый инстанс начинает со случайной части, чтобы не толкаться за одни и те же
+        offset = random.randrange(SCHEDULER_PARTITIONS)
+        for i in range(SCHEDULER_PARTITIONS):
+            index = (offset + i) % SCHEDULER_PARTITIONS
+            if (bucket, index) in done:
+                continue
+            slot_start = bucket.hour * 60 + bucket.minute
+            try:
+                await run_once(
+                    "reminders", bucket,
+                    partial(
+                        notify_tomorrows_tasks,
+                        bot, slot_start, slot_start + REMINDER_BUCKET_MINUTES,
+                        (index, SCHEDULER_PARTITIONS) if SCHEDULER_PARTITIONS > 1 else None,
+                        bucket,
+                    ),
+                    partition=index,
+                    checkpoint=True,
                 )
+            except Exception:
+                logging.exception("[Scheduler] Ошибка напоминаний за %s, часть %s", bucket, index)
+        bucket += step
+
+
+async def run_periodic(job: str, period: timedelta, func, *args):
+    """
+    Выполняет func один раз за интервал period на всех инстансах вместе.
+    Задачу можно вызывать чаще period: пропущенный запуск догонит ближайший вызов.
+    """
+    return await run_once(job, floor_time(datetime.utcnow(), period), partial(func, *args))
+
+
+async def refresh_reminder_slots():
+    """
+    Пересчитывает UTC-слоты после перехода на летнее/зимнее время:
+    по одному UPDATE на каждый часовой пояс.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.timezone).distinct())
+        timezones = result.scalars().all()
+        for timezone in timezones:
+            offset = utc_offset_minutes(timezone)
+            await session.execute(
+                update(User)
+                .where(User.timezone == timezone, User.reminder_slot.is_not(None))
+                .values(reminder_slot=(User.reminder_minute - offset + MINUTES_PER_DAY) % MINUTES_PER_DAY)
             )
-            tasks_result = await session.execute(tasks_stmt)
-            tasks = tasks_result.scalars().all()
-
-            if tasks:
-                msg = "<b>Твои задачи на завтра:</b>\n"
-                for t in tasks:
-                    msg += f"• {t.description}\n"
-                try:
-                    await bot.send_message(user.telegram_id, msg, parse_mode="HTML")
-                except Exception:
-                    logging.exception("[Scheduler] Не удалось отправить %s", user.telegram_id)
-                    continue
+        await session.commit()
+
 
 def start_scheduler(bot: Bot):
     """
-    Запускает планировщик и добавляет ежедневную задачу на 19:00 (MSK).
+    Запускает планировщик: напоминания каждые REMINDER_BUCKET_MINUTES минут
+    по локальному времени пользователей, ежедневный пересчёт слотов,
+    ежечасный перенос старых выполненных задач в архив и продление аренды лидера.
+
+    Задачи регистрируются на каждом инстансе, а от повторного выполнения
+    защищают отметки о запусках в БД (JobRun).
     """
     scheduler.add_job(
-        notify_tomorrows_tasks,
+        notify_reminder_bucket,
         "cron",
         [bot],
-        hour=19, minute=0 # например, для 18:00 по МСК (UTC+3)
+        minute=f"*/{REMINDER_BUCKET_MINUTES}",
+        timezone="UTC",
+    )
+    # Раз в сутки, но проверяем каждый час — если инстанс в 00:01 не работал
+    scheduler.add_job(
+        run_periodic,
+        "cron",
+        ["refresh_reminder_slots", timedelta(days=1), refresh_reminder_slots],
+        minute=1,
+        timezone="UTC",
+    )
+    scheduler.add_job(
+        run_periodic,
+        "cron",
+        ["prune_job_runs", timedelta(days=1), prune_job_runs],
+        minute=3,
+        timezone="UTC",
+    )
+    scheduler.add_job(
+        run_periodic,
+        "cron",
+        ["archive_done_tasks", timedelta(hours=1), archive_done_tasks],
+        minute=37,
+        timezone="UTC",
     )
+    scheduler.add_job(leader.renew, "interval", seconds=max(SCHEDULER_LEASE_TTL // 3, 1))
     scheduler.start()
-    logging.info("[Scheduler] Запущен ежедневный планировщик рассылки задач на завтра.")
+    logging.info("[Scheduler] Запущен планировщик напоминаний (шаг %s мин.).", REMINDER_BUCKET_MINUTES)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from study_buddy_bot.config import (
+    BOT_INSTANCES,
+    SEND_RATE_LIMIT,
+    SEND_WORKERS,
+    SEND_PER_CHAT_INTERVAL,
+    SEND_MAX_RETRIES,
+)
+
+
+class TokenBucket:
+    """
+    Токен-бакет: не больше `rate` операций в секунду, всплеск до `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов (например, после 429 от Telegram)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Общий лимит на все исходящие сообщения процесса: и напоминания, и рассылки.
+# Лимит Telegram — на весь бот, поэтому инстансы делят его поровну
+telegram_bucket = TokenBucket(SEND_RATE_LIMIT / BOT_INSTANCES)
+
+# Время последней отправки в чат — общее для всех отправителей процесса,
+# чтобы напоминание и рассылка в один чат тоже шли с паузой.
+# Храним только «свежие» записи
+chat_last_sent: OrderedDict[int, float] = OrderedDict()
+
+
+@dataclass
+class DeliveryReport:
+    delivered: int = 0
+    failed: int = 0
+    blocked: int = 0
+    failed_ids: list[int] = field(default_factory=list)
+    blocked_ids: list[int] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.delivered + self.failed + self.blocked
+
+    @property
+    def rate(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+
+class OutboundSender:
+    """
+    Отправляет поток сообщений пулом воркеров с общим токен-бакетом,
+    повтором после TelegramRetryAfter и паузой между сообщениями в один чат.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        bucket: TokenBucket = telegram_bucket,
+        workers: int = SEND_WORKERS,
+        per_chat_interval: float = SEND_PER_CHAT_INTERVAL,
+        max_retries: int = SEND_MAX_RETRIES,
+        chat_last: OrderedDict[int, float] = chat_last_sent,
+    ):
+        self.bot = bot
+        self.bucket = bucket
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._chat_last = chat_last
+
+    async def _wait_chat_slot(self, chat_id: int):
+        while True:
+            now = time.monotonic()
+            while self._chat_last:
+                sent_at = next(iter(self._chat_last.values()))
+                if now - sent_at < self.per_chat_interval:
+                    break
+                self._chat_last.popitem(last=False)
+            last = self._chat_last.get(chat_id)
+            if last is None:
+                self._chat_last[chat_id] = now
+                return
+            await asyncio.sleep(self.per_chat_interval - (now - last))
+
+    async def send(self, chat_id: int, text: str, **kwargs) -> str:
+        """
+        Отправляет одно сообщение. Возвращает "delivered", "blocked" или "failed".
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._wait_chat_slot(chat_id)
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                return "delivered"
+            except TelegramRetryAfter as e:
+                logging.warning("[Sender] Flood control, ждём %s сек.", e.retry_after)
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return "blocked"
+            except TelegramBadRequest:
+                logging.warning("Пользователь %s недоступен для рассылки.", chat_id)
+                return "failed"
+            except (TelegramNetworkError, TelegramServerError):
+                logging.warning("[Sender] Сетевая ошибка при отправке %s, попытка %s", chat_id, attempt + 1)
+                # После последней попытки ждать нечего — сразу сообщаем об ошибке
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+            except Exception:
+                logging.exception("Ошибка при отправке %s", chat_id)
+                return "failed"
+        return "failed"
+
+    async def deliver(self, messages, on_sent=None, **kwargs) -> DeliveryReport:
+        """
+        Рассылает пары (chat_id, text) из обычного или асинхронного итератора.
+        Очередь ограничена, поэтому источник читается по мере отправки.
+        Элемент может быть тройкой (chat_id, text, key): тогда после попытки
+        отправки вызывается `await on_sent(key)` — для контрольных точек.
+        """
+        report = DeliveryReport()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        started = time.monotonic()
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                chat_id, text, *key = item
+                status = await self.send(chat_id, text, **kwargs)
+                if status == "delivered":
+                    report.delivered += 1
+                elif status == "blocked":
+                    report.blocked += 1
+                    report.blocked_ids.append(chat_id)
+                else:
+                    report.failed += 1
+                    report.failed_ids.append(chat_id)
+                if on_sent is not None and key:
+                    await on_sent(key[0])
+
+        async def feed():
+            if hasattr(messages, "__aiter__"):
+                async for item in messages:
+                    await queue.put(item)
+            else:
+                for item in messages:
+                    await queue.put(item)
+            for _ in range(self.workers):
+                await queue.put(None)
+
+        pool = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        pool.append(asyncio.create_task(feed()))
+        try:
+            # Ошибка в любом воркере или источнике останавливает всю рассылку:
+            # иначе остальные воркеры разослали бы хвост мимо контрольной точки
+            await asyncio.gather(*pool)
+        finally:
+            for task in pool:
+                task.cancel()
+
+        report.elapsed = time.monotonic() - started
+        return report
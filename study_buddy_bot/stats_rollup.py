@@ -0,0 +1,139 @@
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import select, delete, func, literal
+from study_buddy_bot.models import Task, TaskArchive, UserDailyStats
+from study_buddy_bot.db import dialect_insert
+from study_buddy_bot.counters import bump_counters
+
+
+async def bump_daily_stats(session, user_id: int, day: date, added: int = 0, done: int = 0, closed: int = 0):
+    """
+    Прибавляет счётчики к дневной сводке (upsert). Вызывается в той же сессии,
+    что и изменение задачи, и коммитится вместе с ним.
+    """
+    stmt = dialect_insert(UserDailyStats).values(
+        user_id=user_id, day=day, added=added, done=done, closed=closed,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+        set_={
+            "added": UserDailyStats.added + stmt.excluded.added,
+            "done": UserDailyStats.done + stmt.excluded.done,
+            "closed": UserDailyStats.closed + stmt.excluded.closed,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def on_task_added(session, task: Task):
+    await bump_daily_stats(session, task.user_id, task.created_at.date(), added=1)
+    await bump_counters(session, task.created_at.date(), tasks_created=1)
+
+
+async def on_tasks_imported(session, user_id: int, created_at: datetime, count: int):
+    await bump_daily_stats(session, user_id, created_at.date(), added=count)
+    await bump_counters(session, created_at.date(), tasks_created=count)
+
+
+async def on_task_done(session, task: Task):
+    await bump_daily_stats(session, task.user_id, task.done_at.date(), done=1)
+    await bump_daily_stats(session, task.user_id, task.created_at.date(), closed=1)
+    await bump_counters(session, task.done_at.date(), tasks_done=1)
+
+
+async def on_task_deleted(session, task: Task):
+    if task.is_done and task.done_at:
+        await bump_daily_stats(session, task.user_id, task.done_at.date(), done=-1)
+        await bump_daily_stats(session, task.user_id, task.created_at.date(), added=-1, closed=-1)
+    else:
+        await bump_daily_stats(session, task.user_id, task.created_at.date(), added=-1)
+
+
+async def sum_daily_stats(session, user_id: int, since: date) -> tuple[int, int, int]:
+    """
+    Возвращает (добавлено, выполнено, осталось) начиная с дня `since`.
+    """
+    stmt = (
+        select(
+            func.coalesce(func.sum(UserDailyStats.added), 0),
+            func.coalesce(func.sum(UserDailyStats.done), 0),
+            func.coalesce(func.sum(UserDailyStats.closed), 0),
+        )
+        .where(
+            UserDailyStats.user_id == user_id,
+            UserDailyStats.day >= since,
+        )
+    )
+    result = await session.execute(stmt)
+    added, done, closed = result.one()
+    return added, done, added - closed
+
+
+async def get_daily_stats(session, user_id: int, since: date) -> list[UserDailyStats]:
+    stmt = (
+        select(UserDailyStats)
+        .where(
+            UserDailyStats.user_id == user_id,
+            UserDailyStats.day >= since,
+        )
+        .order_by(UserDailyStats.day)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+
+def _as_date(value) -> date:
+    # SQLite возвращает date() строкой, PostgreSQL — объектом date
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+async def rebuild_daily_stats(session, user_ids: list[int]):
+    """
+    Пересобирает сводки указанных пользователей из таблицы Task и архива.
+    """
+    rows = defaultdict(lambda: {"added": 0, "done": 0, "closed": 0})
+    history = (
+        select(Task.user_id, Task.created_at, Task.is_done, Task.done_at)
+        .where(Task.user_id.in_(user_ids))
+        .union_all(
+            select(TaskArchive.user_id, TaskArchive.created_at, literal(True), TaskArchive.done_at)
+            .where(TaskArchive.user_id.in_(user_ids))
+        )
+        .subquery()
+    )
+    closed = (history.c.is_done == True) & history.c.done_at.is_not(None)
+
+    created_day = func.date(history.c.created_at)
+    stmt = (
+        select(
+            history.c.user_id,
+            created_day,
+            func.count(),
+            func.count().filter(closed),
+        )
+        .group_by(history.c.user_id, created_day)
+    )
+    for user_id, day, added, closed_count in (await session.execute(stmt)).all():
+        row = rows[(user_id, _as_date(day))]
+        row["added"] += added
+        row["closed"] += closed_count
+
+    done_day = func.date(history.c.done_at)
+    stmt = (
+        select(history.c.user_id, done_day, func.count())
+        .where(closed)
+        .group_by(history.c.user_id, done_day)
+    )
+    for user_id, day, done in (await session.execute(stmt)).all():
+        rows[(user_id, _as_date(day))]["done"] += done
+
+    await session.execute(delete(UserDailyStats).where(UserDailyStats.user_id.in_(user_ids)))
+    if rows:
+        await session.execute(
+            UserDailyStats.__table__.insert(),
+            [{"user_id": user_id, "day": day, **counts} for (user_id, day), counts in rows.items()],
+        )
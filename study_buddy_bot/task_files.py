@@ -0,0 +1,274 @@
+import asyncio
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import AsyncGenerator, BinaryIO, Iterator
+from aiogram.types import InputFile
+from study_buddy_bot.utils import DeadlineInPastError, parse_deadline
+
+# Заголовки колонок CSV, которые узнаём при импорте
+CSV_DESCRIPTION_HEADERS = {"description", "task", "summary", "текст", "задача", "описание"}
+CSV_DEADLINE_HEADERS = {"deadline", "due", "date", "дедлайн", "срок", "дата"}
+
+# Время в базе — московское без пояса (UTC+3, без перехода на летнее)
+MSK_OFFSET = timedelta(hours=3)
+
+# Колонки CSV-экспорта; «текст» и «дедлайн» узнаются при обратном импорте
+EXPORT_CSV_HEADER = ("текст", "дедлайн", "статус", "создана", "выполнена")
+
+# Сколько отклонённых строк перечисляем в ответе пользователю
+REJECTED_SHOWN = 10
+
+
+@dataclass
+class ImportResult:
+    tasks: list[tuple[str, date]] = field(default_factory=list)
+    # Первые REJECTED_SHOWN отклонённых строк: (номер строки, причина)
+    rejected: list[tuple[int, str]] = field(default_factory=list)
+    rejected_count: int = 0
+    truncated: bool = False
+
+    def reject(self, line_num: int, reason: str):
+        self.rejected_count += 1
+        if len(self.rejected) < REJECTED_SHOWN:
+            self.rejected.append((line_num, reason))
+
+
+def detect_format(file_name: str | None, mime_type: str | None) -> str | None:
+    name = (file_name or "").lower()
+    if name.endswith(".ics") or mime_type == "text/calendar":
+        return "ics"
+    if name.endswith(".csv") or mime_type in ("text/csv", "text/comma-separated-values"):
+        return "csv"
+    return None
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[tuple[int, str, str]]:
+    """
+    Читает CSV построчно и отдаёт (номер строки, текст, дедлайн).
+    Разделитель — запятая или точка с запятой (так сохраняет Excel).
+    Строка заголовка необязательна; без неё берутся первые две колонки.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    first_line = text.readline()
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    rows = csv.reader(_chain_first(first_line, text), delimiter=delimiter)
+
+    description_col, deadline_col = 0, 1
+    header_checked = False
+    for row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        if not header_checked:
+            header_checked = True
+            header = [cell.strip().lower() for cell in row]
+            found = [i for i, h in enumerate(header) if h in CSV_DESCRIPTION_HEADERS]
+            due = [i for i, h in enumerate(header) if h in CSV_DEADLINE_HEADERS]
+            if found and due:
+                description_col, deadline_col = found[0], due[0]
+                continue
+        yield rows.line_num, *_pick(row, description_col, deadline_col)
+
+
+def _chain_first(first_line: str, rest: Iterator[str]) -> Iterator[str]:
+    if first_line:
+        yield first_line
+    yield from rest
+
+
+def _pick(row: list[str], description_col: int, deadline_col: int) -> tuple[str, str]:
+    description = row[description_col].strip() if description_col < len(row) else ""
+    deadline = row[deadline_col].strip() if deadline_col < len(row) else ""
+    return description, deadline
+
+
+def iter_ics_rows(stream: BinaryIO) -> Iterator[tuple[int, str, str]]:
+    """
+    Построчно разбирает iCalendar и отдаёт (номер строки, текст, дедлайн)
+    для каждого VTODO (срок — DUE) и VEVENT (срок — DTSTART).
+    Дедлайн отдаётся в формате ГГГГ-ММ-ДД; время и часовой пояс отбрасываются.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace")
+    component = None
+    start_line = 0
+    props: dict[str, str] = {}
+    for line_num, line in _unfold(text):
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() in ("VTODO", "VEVENT"):
+            component, start_line, props = value.upper(), line_num, {}
+        elif name == "END" and component is not None and value.upper() == component:
+            raw = props.get("DUE" if component == "VTODO" else "DTSTART") or props.get("DTSTART", "")
+            yield start_line, _ics_unescape(props.get("SUMMARY", "")).strip(), _ics_date(raw)
+            component = None
+        elif component is not None and name in ("SUMMARY", "DUE", "DTSTART"):
+            props[name] = value
+
+
+def _unfold(lines: Iterator[str]) -> Iterator[tuple[int, str]]:
+    """Склеивает перенесённые строки iCalendar (продолжение начинается с пробела)."""
+    current, current_num = None, 0
+    for num, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current_num, current
+        current, current_num = line, num
+    if current is not None:
+        yield current_num, current
+
+
+def _ics_unescape(value: str) -> str:
+    return (
+        value.replace("\\n", " ").replace("\\N", " ")
+        .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+    )
+
+
+def _ics_date(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 8 and value[:8].isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+    return value
+
+
+def parse_tasks_file(stream: BinaryIO, file_format: str, max_rows: int, max_length: int) -> ImportResult:
+    """
+    Разбирает файл задач (синхронно — вызывается в отдельном потоке).
+    Дедлайны проверяются теми же правилами, что и в /add.
+    """
+    result = ImportResult()
+    rows = iter_ics_rows(stream) if file_format == "ics" else iter_csv_rows(stream)
+    for line_num, description, raw_deadline in rows:
+        if not description:
+            result.reject(line_num, "пустой текст задачи")
+            continue
+        if len(description) > max_length:
+            result.reject(line_num, f"текст длиннее {max_length} символов")
+            continue
+        try:
+            deadline = parse_deadline(raw_deadline)
+        except DeadlineInPastError:
+            result.reject(line_num, "дедлайн в прошлом")
+            continue
+        except ValueError:
+            result.reject(line_num, f"неверная дата «{raw_deadline[:20]}»")
+            continue
+        if len(result.tasks) >= max_rows:
+            result.truncated = True
+            break
+        result.tasks.append((description, deadline))
+    return result
+
+
+# Экспорт. Строки — кортежи (id, description, deadline, is_done, created_at, done_at)
+
+def export_header(file_format: str) -> bytes:
+    if file_format == "ics":
+        return _ics_lines([
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//StudyBuddyBot//Tasks//RU",
+        ])
+    # BOM, чтобы Excel открыл UTF-8 без вопросов
+    return "\ufeff".encode() + _csv_bytes([EXPORT_CSV_HEADER])
+
+
+def export_footer(file_format: str) -> bytes:
+    return _ics_lines(["END:VCALENDAR"]) if file_format == "ics" else b""
+
+
+def encode_csv_rows(rows) -> bytes:
+    return _csv_bytes(
+        (
+            description,
+            deadline.isoformat(),
+            "выполнена" if is_done else "в работе",
+            _format_datetime(created_at),
+            _format_datetime(done_at),
+        )
+        for _, description, deadline, is_done, created_at, done_at in rows
+    )
+
+
+def _csv_bytes(rows) -> bytes:
+    out = io.StringIO()
+    csv.writer(out, delimiter=";", lineterminator="\r\n").writerows(rows)
+    return out.getvalue().encode()
+
+
+def encode_ics_rows(rows) -> bytes:
+    lines = []
+    for task_id, description, deadline, is_done, created_at, done_at in rows:
+        lines += [
+            "BEGIN:VTODO",
+            f"UID:task-{task_id}@studybuddybot",
+            f"DTSTAMP:{_ics_datetime(created_at)}",
+            f"SUMMARY:{_ics_escape(description)}",
+            f"DUE;VALUE=DATE:{deadline.strftime('%Y%m%d')}",
+            f"STATUS:{'COMPLETED' if is_done else 'NEEDS-ACTION'}",
+        ]
+        if done_at:
+            lines.append(f"COMPLETED:{_ics_datetime(done_at)}")
+        lines.append("END:VTODO")
+    return _ics_lines(lines)
+
+
+def write_rows(buffer: BinaryIO, file_format: str, rows) -> None:
+    """Кодирует порцию строк и дописывает в буфер (вызывается в отдельном потоке)."""
+    buffer.write(encode_ics_rows(rows) if file_format == "ics" else encode_csv_rows(rows))
+
+
+def _format_datetime(value: datetime | None) -> str:
+    return value.strftime("%Y-%m-%d %H:%M") if value else ""
+
+
+def _ics_datetime(value: datetime) -> str:
+    # RFC 5545 требует DTSTAMP и COMPLETED в UTC с суффиксом Z
+    return (value - MSK_OFFSET).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ics_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _ics_lines(lines: list[str]) -> bytes:
+    return b"".join(_ics_fold(line) for line in lines)
+
+
+def _ics_fold(line: str) -> bytes:
+    """Переносит строку по 75 байт (RFC 5545), не разрывая символы UTF-8."""
+    data = line.encode()
+    parts = []
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        while cut > 0 and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+        limit = 74  # продолжение начинается с пробела
+    parts.append(data)
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+class SpooledInputFile(InputFile):
+    """
+    Отдаёт в Telegram содержимое уже открытого файла (например,
+    SpooledTemporaryFile) порциями, читая его в отдельном потоке.
+    """
+
+    def __init__(self, file: BinaryIO, filename: str, chunk_size: int = 64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot) -> AsyncGenerator[bytes, None]:
+        await asyncio.to_thread(self.file.seek, 0)
+        while chunk := await asyncio.to_thread(self.file.read, self.chunk_size):
+            yield chunk
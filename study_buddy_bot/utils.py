@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+
+def plural_days(n: int) -> str:
+    """Склоняет слово «день» для числа n: 1 день, 2 дня, 5 дней."""
+    if n % 10 == 1 and n % 100 != 11:
+        return "день"
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return "дня"
+    return "дней"
+
+
+def msk_today() -> date:
+    # Даты задач хранятся по МСК (UTC+3)
+    return (datetime.utcnow() + timedelta(hours=3)).date()
+
+
+class DeadlineInPastError(ValueError):
+    pass
+
+
+def parse_deadline(value: str) -> date:
+    """
+    Разбирает дедлайн в формате ГГГГ-ММ-ДД. Бросает ValueError при неверном
+    формате и DeadlineInPastError, если дата уже прошла.
+    """
+    deadline = datetime.strptime(value.strip(), "%Y-%m-%d").date()
+    check_deadline(deadline)
+    return deadline
+
+
+def check_deadline(deadline: date) -> date:
+    if deadline < date.today():
+        raise DeadlineInPastError(deadline)
+    return deadline
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей.
+    """
+
+    MISSING = object()
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=MISSING):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
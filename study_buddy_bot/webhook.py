@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from sqlalchemy import text
+from study_buddy_bot.db import engine
+from study_buddy_bot.config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    UPDATES_CONCURRENCY,
+)
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """
+    Проверка для балансировщика: процесс жив и база отвечает.
+    """
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception:
+        logging.exception("[Webhook] Health check: база недоступна")
+        return web.Response(status=503, text="db unavailable")
+    return web.Response(text="ok")
+
+
+async def on_startup(bot: Bot):
+    if not WEBHOOK_URL:
+        logging.warning("[Webhook] WEBHOOK_URL не задан, set_webhook пропущен.")
+        return
+    await bot.set_webhook(
+        f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        max_connections=min(UPDATES_CONCURRENCY, 100),
+    )
+    logging.info("[Webhook] Webhook установлен на %s%s", WEBHOOK_URL, WEBHOOK_PATH)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """
+    Поднимает aiohttp-сервер с обработчиком webhook и /healthz.
+    Несколько таких инстансов можно поставить за балансировщик.
+    """
+    dp.startup.register(on_startup)
+
+    app = web.Application()
+    app.router.add_get("/healthz", healthz)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET,
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logging.info("[Webhook] Сервер запущен на %s:%s", WEBHOOK_HOST, WEBHOOK_PORT)
+
+    # SIGTERM (docker stop, оркестратор) и SIGINT завершают сервер штатно:
+    # runner.cleanup закрывает сервер и вызывает shutdown диспетчера,
+    # затем в main отрабатывает finally (рассылки, аренда лидера, метрики)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: обработчики сигналов в цикле событий не поддерживаются
+            pass
+    try:
+        await stop.wait()
+        logging.info("[Webhook] Получен сигнал остановки, завершаем работу")
+    finally:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.remove_signal_handler(sig)
+            except NotImplementedError:
+                pass
+        await runner.cleanup()
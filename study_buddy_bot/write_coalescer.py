@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, TypeVar
+from study_buddy_bot.db import AsyncSessionLocal, engine
+from study_buddy_bot.config import WRITE_COALESCE_MS, WRITE_COALESCE_MAX_BATCH
+
+T = TypeVar("T")
+WriteOp = Callable[[Any], Awaitable[T]]
+
+
+class WriteCoalescer:
+    """
+    Групповой коммит: изменения задач из параллельных апдейтов копятся
+    `window` секунд и выполняются одной транзакцией — один fsync на пачку
+    вместо одного на каждое изменение.
+
+    Каждая операция идёт в своём SAVEPOINT: ошибка откатывает только её.
+    Результат операции отдаётся вызывающему только после COMMIT, то есть
+    когда изменение уже надёжно записано. Операции выполняются строго в
+    порядке поступления, пачки — одна за другой, поэтому порядок изменений
+    одного пользователя сохраняется.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[tuple[WriteOp, asyncio.Future]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, op: WriteOp[T]) -> T:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    async def _collect(self) -> list[tuple[WriteOp, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                raise
+            except Exception:
+                logging.exception("[Writes] Ошибка группового коммита")
+
+    async def _flush(self, batch: list[tuple[WriteOp, asyncio.Future]]):
+        results = []
+        try:
+            async with AsyncSessionLocal() as session:
+                for op, future in batch:
+                    if future.cancelled():
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await op(session)
+                            await session.flush()
+                        results.append((future, result, None))
+                    except Exception as e:
+                        results.append((future, None, e))
+                await session.commit()
+        except Exception as e:
+            # Коммит не прошёл — ни одно изменение пачки не записано
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if len(batch) > 1:
+            logging.debug("[Writes] Пачка из %s изменений записана одним коммитом", len(batch))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def create_write_coalescer() -> WriteCoalescer | None:
+    """
+    Групповой коммит по настройкам. Только для PostgreSQL: в SQLite пачка
+    держит блокировку записи на всё окно, и остальные записи падают с
+    «database is locked» — там группировка выключается с предупреждением.
+    """
+    if WRITE_COALESCE_MS <= 0:
+        return None
+    if engine.dialect.name != "postgresql":
+        logging.warning(
+            "[Writes] WRITE_COALESCE_MS=%s игнорируется: групповой коммит работает только с PostgreSQL, а база — %s",
+            WRITE_COALESCE_MS, engine.dialect.name,
+        )
+        return None
+    return WriteCoalescer(WRITE_COALESCE_MS / 1000, WRITE_COALESCE_MAX_BATCH)
+
+
+# None — группировка выключена, каждое изменение коммитится сразу
+write_coalescer = create_write_coalescer()
+
+
+async def run_write(op: WriteOp[T]) -> T:
+    """
+    Выполняет изменение `op(session)` и возвращает его результат после
+    коммита: через общий групповой коммит или в собственной транзакции.
+    """
+    if write_coalescer is not None:
+        return await write_coalescer.submit(op)
+    async with AsyncSessionLocal() as session:
+        result = await op(session)
+        await session.commit()
+    return result